@@ -1,8 +1,9 @@
-import requests
-import re
+import asyncio
+import os
 import traceback
 import datetime
 import time
+import aiohttp
 import mysql.connector
 from langdetect import detect
 from nltk.sentiment import SentimentIntensityAnalyzer
@@ -10,6 +11,11 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from textblob import TextBlob
 
+from .llm_cache import llm_cache, llm_flights
+from .llm_client import ollama
+from .llm_metrics import ensure_metrics_server
+from .llm_scheduler import CRISIS, NORMAL, SAD, Overloaded, scheduler
+
 
 # ==================== Utilities ====================
 
@@ -33,20 +39,53 @@ def is_tanglish(text):
     return count > 0 and any(c.isalpha() and c not in tamil_chars for c in text)
 
 
-def log_mood_simple(session_id, mood_score, source="chat"):
+_analyzer = None
+
+def sentiment_analyzer():
+    # loading the VADER lexicon takes a while, so do it once per process
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+BACKEND_URL = os.environ.get("AURACARE_BACKEND_URL", "http://localhost:5000")
+MOOD_LOG_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_connect=2)
+
+_backend_session = None
+_background_tasks = set()
+
+def backend_session():
+    # one keep-alive pool for calls back into the API, made lazily on the action server's loop
+    global _backend_session
+    if _backend_session is None or _backend_session.closed:
+        _backend_session = aiohttp.ClientSession(timeout=MOOD_LOG_TIMEOUT)
+    return _backend_session
+
+def in_background(coro):
+    # fire and forget, but keep a reference so the task isn't garbage collected mid-flight
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def log_mood_simple(session_id, email, mood_score, source="chat", event_key=None):
+    payload = {
+        "session_id": session_id,
+        "email": email,
+        "mood": mood_score,
+        "source": source,
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }
+    if event_key:
+        payload["event_key"] = event_key  # re-runs of the action for the same message are ignored
     try:
-        response = requests.post(
-            "http://localhost:5000/api/mood-log",
-            json={
-                "session_id": session_id,
-                "mood": mood_score,
-                "source": source,
-                "timestamp": datetime.datetime.utcnow().isoformat()
-            }
-        )
-        print(f"📊 Mood logged: {response.status_code} - {response.json()}")
-    except Exception as e:
-        print("❌ Failed to log mood:", e)
+        async with backend_session().post(f"{BACKEND_URL}/api/mood-log", json=payload) as response:
+            body = await response.json(content_type=None)
+        print(f"📊 Mood logged: {response.status} - {body}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        print("❌ Failed to log mood:", repr(e))
 
 
 # ==================== User Registration ====================
@@ -100,15 +139,54 @@ class ActionLoginUser(Action):
 
 # ==================== LLaMA Emotional Response ====================
 
+LLAMA_PARAMS = {"temperature": 0.6, "num_predict": 25}
+LLAMA_FALLBACK = "😓 Sorry, LLaMA 3 isn't responding. Please try again soon."
+CACHE_REPORT_EVERY = 100   # print the response cache stats every N lookups
+CRISIS_COMPOUND = -0.6     # VADER score at or below which a message jumps the LLM queue
+
+# domain.yml response to give instead of the LLM when it's overloaded
+FALLBACK_RESPONSES = {
+    "express_sadness":    "utter_comfort",
+    "emotional_support":  "utter_comfort",
+    "express_stress":     "utter_stress_advice",
+}
+
+# prompt templates; the template is part of the response cache key
+PERSONAS = {
+    "ta": (
+        "நீங்கள் ஒரு அன்பான நண்பர். கீழே உள்ள செய்திக்கு மிக எளிமையாகவும், மென்மையாகவும் "
+        "தமிழில் 2 அல்லது 3 வரிகளில் பதிலளிக்கவும்:\n\n{msg}"
+    ),
+    "tanglish": (
+        "You are a warm friend. Reply casually in Tanglish (Tamil + English mix), in 2 or 3 short lines:\n\n{msg}"
+    ),
+    "en": (
+        "You're a kind and supportive friend. Respond in English in just 2 or 3 short lines:\n\n{msg}"
+    ),
+}
+
+def message_priority(intent, compound):
+    if intent == "crisis_support" or compound <= CRISIS_COMPOUND:
+        return CRISIS
+    if compound < 0:
+        return SAD
+    return NORMAL
+
+def fallback_response(intent, domain):
+    responses = (domain or {}).get("responses", {})
+    name = FALLBACK_RESPONSES.get(intent, f"utter_{intent}")
+    return name if name in responses else "utter_comfort"
+
 class ActionMultilingualLlama(Action):
     def name(self):
         return "action_multilingual_llama"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: dict):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: dict):
+        await ensure_metrics_server()   # first call only: needs the running loop
         user_msg = tracker.latest_message.get("text", "")
         lang = detect_language(user_msg)
 
-        analyzer = SentimentIntensityAnalyzer()
+        analyzer = sentiment_analyzer()
         score = analyzer.polarity_scores(user_msg)
         very_sad = len(user_msg.strip()) > 80 and score["compound"] < -0.5
 
@@ -116,11 +194,24 @@ class ActionMultilingualLlama(Action):
         vader_score = analyzer.polarity_scores(user_msg)
         mood_score = int((vader_score["compound"] + 1) * 5)  # Scale to 0–10
 
+        intent = (tracker.latest_message.get("intent") or {}).get("name")
+        priority = message_priority(intent, vader_score["compound"])
+
         # ✅ Get session ID
         session_id = tracker.get_slot("session_id") or tracker.sender_id
 
-        # ✅ Log mood (source is "chat")
-        log_mood_simple(session_id, mood_score, source="chat")
+        # ✅ Log mood (source is "chat") for the user the chat gateway names in the metadata,
+        # unless the gateway already logged the browser's reading for this turn
+        # (in the background: a slow API mustn't hold up the reply)
+        metadata = tracker.latest_message.get("metadata") or {}
+        email = metadata.get("email") or tracker.get_slot("email")
+        message_id = tracker.latest_message.get("message_id")
+        event_key = metadata.get("event_key") or (f"rasa:{message_id}" if message_id else None)
+        if not email:
+            print("⚠️ No email for this conversation, mood not logged")
+        elif not metadata.get("mood_logged"):
+            in_background(log_mood_simple(session_id, email, mood_score, source="chat",
+                                          event_key=event_key))
 
         if very_sad:
             dispatcher.utter_message(
@@ -138,47 +229,64 @@ class ActionMultilingualLlama(Action):
             print(f"🧠 Detected language: {lang}")
             print(f"📥 Prompt input: {user_msg}")
 
-            prompt = self.build_prompt(user_msg, lang)
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "llama3",
-                    "prompt": prompt,
-                    "stream": False,
-                    "temperature": 0.6,
-                    "num_predict": 25
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=100
-            )
-            response.raise_for_status()
-            reply = response.json().get("response", "").strip()
-            reply = re.sub(r'\x1b\[.*?m', '', reply)
+            template = self.persona(user_msg, lang)
+            cached = llm_cache.lookup(lang, template, user_msg)
+            if llm_cache.lookups % CACHE_REPORT_EVERY == 0:
+                print(f"📈 LLM cache: {llm_cache.stats()} | in-flight: {llm_flights.stats()}"
+                      f" | scheduler: {scheduler.stats()}")
+            if cached.reply:
+                print(f"💾 LLaMA 3 reply from cache ({cached.tier} match)")
+                dispatcher.utter_message(text=cached.reply)
+                return []
+
+            prompt = template.format(msg=user_msg)
+            stream = metadata.get("stream")
+            num_predict = LLAMA_PARAMS["num_predict"]
+            if stream and not cached.recurring:
+                # a one-off message: the chat gateway streams tokens to the browser itself.
+                # It still takes a slot, held for as long as the generation should take
+                await scheduler.acquire(priority, num_predict)
+                scheduler.release_later(ollama.estimate(num_predict))
+                dispatcher.utter_message(json_message={"llm_stream": {
+                    "model": "llama3", "prompt": prompt, "params": LLAMA_PARAMS, "fallback": LLAMA_FALLBACK,
+                }})
+                return []
+
+            async def generate():
+                # pooled keep-alive connection; other conversations keep running while this one waits
+                # (recurring messages are generated whole, even for the stream, so the cache can fill)
+                async with scheduler.slot(priority, num_predict):
+                    reply = await ollama.generate(prompt, **LLAMA_PARAMS)
+                llm_cache.store(cached, reply)
+                return reply
+
+            # the same message from several users at once shares one generation
+            reply = await llm_flights.run(cached.key, generate)
 
             print(f"✅ LLaMA 3 reply:\n{reply}")
 
-        except Exception as e:
-            reply = "😓 Sorry, LLaMA 3 isn't responding. Please try again soon."
+        except Overloaded as e:
+            response = fallback_response(intent, domain)
+            print(f"🚦 LLaMA 3 overloaded ({e}), answering with {response} | scheduler: {scheduler.stats()}")
+            dispatcher.utter_message(response=response)
+            return []
+        except Exception:
+            reply = LLAMA_FALLBACK
             print("❌ LLaMA 3 connection failed:")
             traceback.print_exc()
 
         dispatcher.utter_message(text=reply)
         return []
 
+    def persona(self, msg, lang):
+        if lang == "ta":
+            return PERSONAS["ta"]
+        if is_tanglish(msg):
+            return PERSONAS["tanglish"]
+        return PERSONAS["en"]
+
     def build_prompt(self, msg, lang):
-      if lang == "ta":
-        return (
-            f"நீங்கள் ஒரு அன்பான நண்பர். கீழே உள்ள செய்திக்கு மிக எளிமையாகவும், மென்மையாகவும் "
-            f"தமிழில் 2 அல்லது 3 வரிகளில் பதிலளிக்கவும்:\n\n{msg}"
-        )
-      elif is_tanglish(msg):
-        return (
-            f"You are a warm friend. Reply casually in Tanglish (Tamil + English mix), in 2 or 3 short lines:\n\n{msg}"
-        )
-      else:
-        return (
-            f"You're a kind and supportive friend. Respond in English in just 2 or 3 short lines:\n\n{msg}"
-        )
+        return self.persona(msg, lang).format(msg=msg)
 
 
         
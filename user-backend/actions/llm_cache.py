@@ -0,0 +1,300 @@
+"""Response cache for the LLaMA replies in ActionMultilingualLlama.
+
+Lots of messages are the same few feelings in different words ("i feel sad",
+"I'm so stressed today"), and each one used to cost a full llama3
+generation. Replies are cached per (language, persona template, normalized
+message) in two tiers:
+
+- exact: the normalized message matches an entry;
+- near: MinHash/LSH over character shingles finds an entry whose shingles
+  are at least `similarity` Jaccard-similar and that has the same negations,
+  so "i feel okay" never answers "i dont feel okay".
+
+An entry collects up to `variants` replies before it serves any, and a hit
+picks one at random, so a regular doesn't get the same line every time.
+Entries expire `ttl` seconds after they're created; past `maxsize` the least
+recently used go first.
+
+Generating a message that never comes back just to cache it would cost the
+user streaming, so `Lookup.recurring` says whether this message (or a near
+one) was seen before; only recurring ones are worth filling.
+
+SingleFlight covers the other half: a burst of the same message arrives
+before any reply is cached, so concurrent misses on one cache key share a
+single generation instead of each starting their own.
+
+Settings: AURACARE_LLM_CACHE_SIZE (0 turns it off), AURACARE_LLM_CACHE_TTL
+(seconds), AURACARE_LLM_CACHE_VARIANTS, AURACARE_LLM_CACHE_SIMILARITY,
+AURACARE_LLM_MAX_WAITERS (callers sharing one generation).
+"""
+import asyncio
+import os
+import random
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+DEFAULT_SIZE = int(os.environ.get("AURACARE_LLM_CACHE_SIZE", "2048"))
+DEFAULT_TTL = float(os.environ.get("AURACARE_LLM_CACHE_TTL", str(6 * 3600)))
+DEFAULT_VARIANTS = int(os.environ.get("AURACARE_LLM_CACHE_VARIANTS", "3"))
+DEFAULT_SIMILARITY = float(os.environ.get("AURACARE_LLM_CACHE_SIMILARITY", "0.7"))
+DEFAULT_MAX_WAITERS = int(os.environ.get("AURACARE_LLM_MAX_WAITERS", "32"))
+
+MAX_CHARS = 200     # longer messages are too personal to come back
+SHINGLE = 3         # characters per shingle
+NUM_PERM = 32       # MinHash permutations...
+BANDS = 8           # ...split into 8 LSH bands of 4
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+
+NEGATIONS = frozenset({
+    "no", "not", "never", "nothing", "nobody", "none", "cannot", "hardly",
+    "dont", "doesnt", "didnt", "cant", "couldnt", "wont", "wouldnt",
+    "isnt", "arent", "wasnt", "werent", "havent", "hasnt", "shouldnt",
+})
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Casefold, drop apostrophes, punctuation and emoji, collapse spaces."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("'", "").replace("’", "")
+    # by category, not \W: \W would also strip Tamil vowel signs
+    text = "".join(" " if unicodedata.category(c)[0] in "PSZC" else c for c in text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def shingles(text):
+    if len(text) <= SHINGLE:
+        return frozenset([text])
+    return frozenset(text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1))
+
+
+def minhash(shingle_set):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def band_keys(scope, signature):
+    return [(scope, i, signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class _Entry:
+    __slots__ = ("key", "shingles", "negations", "bands", "replies", "seen", "expires")
+
+    def __init__(self, key, shingle_set, bands, expires):
+        self.key = key
+        self.shingles = shingle_set
+        self.negations = NEGATIONS.intersection(key[1].split())
+        self.bands = bands
+        self.replies = []
+        self.seen = 1
+        self.expires = expires
+
+
+class Lookup:
+    """What ResponseCache.lookup() found; hand it back to store()."""
+    __slots__ = ("reply", "recurring", "tier", "key")
+
+    def __init__(self, reply=None, recurring=False, tier=None, key=None):
+        self.reply = reply
+        self.recurring = recurring
+        self.tier = tier      # "exact" / "near" on a hit
+        self.key = key        # entry to fill; None if the message isn't cacheable
+
+
+class ResponseCache:
+    def __init__(self, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL, variants=DEFAULT_VARIANTS,
+                 similarity=DEFAULT_SIMILARITY):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self.similarity = similarity
+        self._entries = OrderedDict()   # (scope, text) -> _Entry, oldest use first
+        self._bands = {}                # (scope, band no, band) -> set of entry keys
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.fills = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @property
+    def lookups(self):
+        return self.exact_hits + self.near_hits + self.misses + self.skipped
+
+    def lookup(self, lang, template, message):
+        text = normalize(message)
+        if self.maxsize <= 0 or not text or len(text) > MAX_CHARS:
+            self.skipped += 1
+            return Lookup()
+
+        now = time.monotonic()
+        scope = (lang, template)
+        key = (scope, text)
+        tier, entry = "exact", self._live(key, now)
+        if entry is None:
+            shingle_set = shingles(text)
+            bands = band_keys(scope, minhash(shingle_set))
+            tier, entry = "near", self._nearest(text, shingle_set, bands, now)
+
+        if entry is None:
+            # first sighting: remember it so a repeat counts as recurring
+            self._add(key, shingle_set, bands, now)
+            self.misses += 1
+            return Lookup(key=key)
+
+        entry.seen += 1
+        self._entries.move_to_end(entry.key)
+        if len(entry.replies) < self.variants:
+            self.misses += 1
+            return Lookup(recurring=True, key=entry.key)
+        if tier == "exact":
+            self.exact_hits += 1
+        else:
+            self.near_hits += 1
+        return Lookup(random.choice(entry.replies), True, tier, entry.key)
+
+    def store(self, lookup, reply):
+        if lookup.key is None or not reply:
+            return
+        now = time.monotonic()
+        entry = self._live(lookup.key, now)
+        if entry is None:
+            # evicted or expired while the reply was generating
+            shingle_set = shingles(lookup.key[1])
+            entry = self._add(lookup.key, shingle_set,
+                              band_keys(lookup.key[0], minhash(shingle_set)), now)
+        if len(entry.replies) < self.variants:
+            entry.replies.append(reply)
+            self.fills += 1
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires <= now:
+            self._remove(key)
+            self.expired += 1
+            return None
+        return entry
+
+    def _nearest(self, text, shingle_set, bands, now):
+        candidates = set()
+        for band in bands:
+            candidates.update(self._bands.get(band, ()))
+        negations = NEGATIONS.intersection(text.split())
+        best, best_sim = None, self.similarity
+        for key in candidates:
+            entry = self._live(key, now)
+            if entry is None or entry.negations != negations:
+                continue
+            sim = len(shingle_set & entry.shingles) / len(shingle_set | entry.shingles)
+            if sim >= best_sim:
+                best, best_sim = entry, sim
+        return best
+
+    def _add(self, key, shingle_set, bands, now):
+        entry = _Entry(key, shingle_set, bands, now + self.ttl)
+        self._entries[key] = entry
+        for band in bands:
+            self._bands.setdefault(band, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band in entry.bands:
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band]
+
+    def stats(self):
+        served = self.exact_hits + self.near_hits
+        lookups = self.lookups
+        return {
+            "size":       len(self._entries),
+            "maxsize":    self.maxsize,
+            "exact_hits": self.exact_hits,
+            "near_hits":  self.near_hits,
+            "misses":     self.misses,
+            "skipped":    self.skipped,
+            "fills":      self.fills,
+            "evictions":  self.evictions,
+            "expired":    self.expired,
+            "hit_rate":   round(served / lookups, 3) if lookups else None,
+        }
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call.
+
+    The call runs as its own task, so a caller that gives up (Rasa timing out
+    the action) doesn't cancel it for the others. Each flight takes at most
+    `max_waiters` callers besides the one that started it; the next caller
+    starts a fresh flight, so one slow or failed generation can't hold up an
+    unbounded crowd.
+    """
+
+    def __init__(self, max_waiters=DEFAULT_MAX_WAITERS):
+        self.max_waiters = max_waiters
+        self._flights = {}       # key -> _Flight
+        self.flights = 0         # calls actually started
+        self.joined = 0          # callers that shared someone else's call
+        self.overflows = 0       # flights started because one was full
+        self.peak_waiters = 0
+
+    async def run(self, key, call):
+        """Await `call()`, or the in-flight call already running for `key`."""
+        if key is None:
+            return await call()
+        flight = self._flights.get(key)
+        if flight is not None and flight.waiters < self.max_waiters:
+            flight.waiters += 1
+            self.joined += 1
+            self.peak_waiters = max(self.peak_waiters, flight.waiters)
+            return await asyncio.shield(flight.task)
+
+        if flight is not None:
+            self.overflows += 1
+        flight = _Flight(asyncio.ensure_future(call()))
+        self._flights[key] = flight
+        self.flights += 1
+        flight.task.add_done_callback(lambda task: self._done(key, flight))
+        return await asyncio.shield(flight.task)
+
+    def _done(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()   # retrieved even if every caller gave up
+
+    def stats(self):
+        return {
+            "in_flight":    len(self._flights),
+            "flights":      self.flights,
+            "saved":        self.joined,
+            "overflows":    self.overflows,
+            "peak_waiters": self.peak_waiters,
+            "max_waiters":  self.max_waiters,
+        }
+
+
+# one of each for the whole action server (actions share its event loop, so no lock)
+llm_cache = ResponseCache()
+llm_flights = SingleFlight()
@@ -0,0 +1,99 @@
+"""Shared async client for the Ollama generate API.
+
+The action server runs actions on one event loop, so a blocking HTTP call
+there stalls every conversation. OllamaClient keeps one aiohttp session per
+process with a keep-alive connection pool, and every call has its own
+deadline, so dozens of generations can be in flight at once and a slow one
+only costs its own user a timeout.
+
+Settings: AURACARE_OLLAMA_URL, AURACARE_LLM_POOL (max open connections),
+AURACARE_LLM_DEADLINE (seconds per generation).
+"""
+import asyncio
+import os
+import re
+import time
+
+import aiohttp
+
+OLLAMA_URL = os.environ.get("AURACARE_OLLAMA_URL", "http://localhost:11434")
+DEFAULT_POOL_SIZE = int(os.environ.get("AURACARE_LLM_POOL", "64"))
+DEFAULT_DEADLINE = float(os.environ.get("AURACARE_LLM_DEADLINE", "30"))
+CONNECT_TIMEOUT = 3
+
+# throughput guesses until the first generation reports real numbers
+# (llama3 on a laptop CPU); the scheduler turns these into wait estimates
+INITIAL_TOKENS_PER_S = 8.0
+INITIAL_OVERHEAD_S = 1.0
+SMOOTHING = 0.2     # weight of the newest sample in the moving averages
+
+ANSI_ESCAPE = re.compile(r'\x1b\[.*?m')
+
+
+class LLMUnavailable(RuntimeError):
+    """The model didn't answer within the deadline, or answered with an error."""
+
+
+class OllamaClient:
+    def __init__(self, base_url=OLLAMA_URL, pool_size=DEFAULT_POOL_SIZE, deadline=DEFAULT_DEADLINE):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.deadline = deadline
+        self._session = None
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.tokens_per_s = INITIAL_TOKENS_PER_S
+        self.overhead_s = INITIAL_OVERHEAD_S   # model load + prompt eval, per generation
+
+    def _get_session(self):
+        # created lazily: an aiohttp session belongs to the loop it was made on
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def generate(self, prompt, model="llama3", deadline=None, **options):
+        """Non-streaming /api/generate; returns the cleaned response text.
+
+        `options` (temperature, num_predict, ...) go under "options": Ollama
+        ignores sampling settings at the top level of the request.
+        """
+        timeout = aiohttp.ClientTimeout(total=deadline or self.deadline, sock_connect=CONNECT_TIMEOUT)
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options}
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            async with self._get_session().post(f"{self.base_url}/api/generate", json=payload,
+                                                timeout=timeout) as resp:
+                resp.raise_for_status()
+                body = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.errors += 1
+            raise LLMUnavailable(f"{type(e).__name__}: {e}") from e
+        finally:
+            self.in_flight -= 1
+            self.calls += 1
+        print(f"⏱️ LLM generation took {time.perf_counter() - start:.2f}s")
+        self._record_throughput(body)
+        return ANSI_ESCAPE.sub('', body.get("response", "").strip())
+
+    def _record_throughput(self, body):
+        # Ollama reports durations in nanoseconds
+        tokens, eval_ns, total_ns = body.get("eval_count"), body.get("eval_duration"), body.get("total_duration")
+        if tokens and eval_ns:
+            self.tokens_per_s += SMOOTHING * (tokens / (eval_ns / 1e9) - self.tokens_per_s)
+        if eval_ns and total_ns and total_ns >= eval_ns:
+            self.overhead_s += SMOOTHING * ((total_ns - eval_ns) / 1e9 - self.overhead_s)
+
+    def estimate(self, num_predict):
+        """Expected seconds for one generation of up to `num_predict` tokens."""
+        return self.overhead_s + num_predict / max(self.tokens_per_s, 0.1)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# one pool for the whole action server
+ollama = OllamaClient()
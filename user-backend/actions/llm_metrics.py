@@ -0,0 +1,54 @@
+"""JSON stats for the LLM path, served from inside the action server.
+
+The response cache, single-flight table and scheduler live in the action
+server's process, and rasa_sdk has no hook for extra routes, so the first
+LLaMA action starts a small aiohttp server next to it on the same loop:
+
+    curl localhost:5056/metrics
+
+The API's /api/metrics includes the same numbers under "llm_actions".
+
+Settings: AURACARE_ACTIONS_METRICS_PORT (0 turns it off),
+AURACARE_ACTIONS_METRICS_HOST.
+"""
+import os
+
+from aiohttp import web
+
+from .llm_cache import llm_cache, llm_flights
+from .llm_scheduler import scheduler
+
+METRICS_HOST = os.environ.get("AURACARE_ACTIONS_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("AURACARE_ACTIONS_METRICS_PORT", "5056"))
+
+_runner = None
+
+
+def llm_stats():
+    return {
+        "scheduler": scheduler.stats(),
+        "cache":     llm_cache.stats(),
+        "in_flight": llm_flights.stats(),
+    }
+
+
+async def _metrics(request):
+    return web.json_response(llm_stats())
+
+
+async def ensure_metrics_server():
+    """Start the /metrics listener once; later calls do nothing."""
+    global _runner
+    if _runner is not None or not METRICS_PORT:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    try:
+        await web.TCPSite(_runner, METRICS_HOST, METRICS_PORT).start()
+    except OSError as e:
+        # another action server process got the port first; its numbers are still served
+        print(f"⚠️ LLM metrics not served on {METRICS_HOST}:{METRICS_PORT}: {e}")
+    else:
+        print(f"📈 LLM metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
@@ -0,0 +1,127 @@
+"""Admission control and a priority queue in front of Ollama.
+
+Ollama works through generations on the CPU a few at a time, and everything
+beyond that used to pile up inside it until the client deadline. The
+scheduler lets at most `capacity` generations run and queues the rest by
+priority: crisis first, then sad, then everything else, FIFO within a level.
+
+Before queueing, it estimates the wait from the client's recent tokens/s.
+If that's over `budget` seconds, the request is shed right away so the
+action can answer from the domain's utter_* responses instead of leaving the
+user watching a typing indicator. A queued request that still hasn't started
+after `max_wait` seconds (the estimate was wrong) is shed the same way.
+
+Settings: AURACARE_LLM_CONCURRENCY, AURACARE_LLM_WAIT_BUDGET (seconds),
+AURACARE_LLM_MAX_WAIT (seconds).
+"""
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+
+from .llm_client import ollama
+
+DEFAULT_CAPACITY = int(os.environ.get("AURACARE_LLM_CONCURRENCY", "2"))
+DEFAULT_BUDGET = float(os.environ.get("AURACARE_LLM_WAIT_BUDGET", "8"))
+DEFAULT_MAX_WAIT = float(os.environ.get("AURACARE_LLM_MAX_WAIT", "15"))
+
+CRISIS, SAD, NORMAL = 0, 1, 2
+PRIORITY_NAMES = {CRISIS: "crisis", SAD: "sad", NORMAL: "normal"}
+
+
+class Overloaded(RuntimeError):
+    """The generation wasn't admitted; answer without the LLM."""
+
+
+class Scheduler:
+    def __init__(self, client, capacity=DEFAULT_CAPACITY, budget=DEFAULT_BUDGET, max_wait=DEFAULT_MAX_WAIT):
+        self.client = client
+        self.capacity = max(1, capacity)
+        self.budget = budget
+        self.max_wait = max_wait
+        self.running = 0
+        self._queue = []                 # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self.admitted = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.queued = 0
+        self.shed_estimate = 0
+        self.shed_timeout = 0
+
+    def depth(self):
+        # futures that were cancelled or timed out stay in the heap until popped
+        return sum(1 for _, _, fut in self._queue if not fut.done())
+
+    def estimate_wait(self, priority, num_predict):
+        """Seconds a new request at `priority` would wait for a slot."""
+        if self.running < self.capacity and not self.depth():
+            return 0.0
+        ahead = sum(1 for p, _, fut in self._queue if p <= priority and not fut.done())
+        return (ahead + 1) * self.client.estimate(num_predict) / self.capacity
+
+    async def acquire(self, priority, num_predict):
+        """Wait for a generation slot; raises Overloaded instead of waiting too long."""
+        wait = self.estimate_wait(priority, num_predict)
+        if not wait:
+            self.running += 1
+            self.admitted[PRIORITY_NAMES[priority]] += 1
+            return
+        if wait > self.budget:
+            self.shed_estimate += 1
+            raise Overloaded(f"estimated wait {wait:.1f}s is over the {self.budget:g}s budget")
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), fut))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            raise Overloaded(f"no slot after {self.max_wait:g}s") from None
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()   # the slot was handed over just as we gave up
+            raise
+        self.admitted[PRIORITY_NAMES[priority]] += 1
+
+    def release(self):
+        while self._queue:
+            _, _, fut = heapq.heappop(self._queue)
+            if not fut.done():
+                fut.set_result(None)   # hand the slot straight to the next in line
+                return
+        self.running -= 1
+
+    def release_later(self, seconds):
+        """Release a slot whose generation runs elsewhere, once it should be done."""
+        asyncio.get_running_loop().call_later(seconds, self.release)
+
+    @asynccontextmanager
+    async def slot(self, priority, num_predict):
+        await self.acquire(priority, num_predict)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        by_priority = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        for p, _, fut in self._queue:
+            if not fut.done():
+                by_priority[PRIORITY_NAMES[p]] += 1
+        return {
+            "running":        self.running,
+            "capacity":       self.capacity,
+            "queue_depth":    sum(by_priority.values()),
+            "queued_by":      by_priority,
+            "admitted":       dict(self.admitted),
+            "queued":         self.queued,
+            "shed_estimate":  self.shed_estimate,
+            "shed_timeout":   self.shed_timeout,
+            "tokens_per_s":   round(self.client.tokens_per_s, 1),
+            "overhead_s":     round(self.client.overhead_s, 2),
+        }
+
+
+# one queue for the whole action server, in front of the shared client
+scheduler = Scheduler(ollama)
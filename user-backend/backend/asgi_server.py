@@ -0,0 +1,308 @@
+"""ASGI build of the core AuraCare API (Quart + Motor).
+
+Serves the same URLs and payloads as server.py for signup/login, chat and
+mood logging, sessions, quizzes and music, but every MongoDB call is awaited
+on one shared Motor connection pool, so a slow query parks a coroutine
+instead of a thread. Run it with any ASGI server, e.g.
+
+    uvicorn asgi_server:app --port 5001 --workers 4
+
+Connection settings are the AURACARE_MONGO_* variables described in mongo.py.
+"""
+import asyncio
+import os
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from quart import Quart, jsonify, request
+
+import mongo
+import rollups
+from cache import KnownSessions, TTLCache
+from documents import (MESSAGE_FIELDS, MUSIC_FIELDS, MUSIC_PIPELINE, QUIZ_PIPELINE,
+                       build_message_doc, build_mood_doc, quiz_fields,
+                       session_summary_pipeline, session_upsert_spec, sessions_pipeline)
+from hashing import HasherBusy, PasswordHasher
+from indexes import bootstrap as bootstrap_indexes
+from jsonprovider import MongoJSONProvider
+from pagination import InvalidCursor, finish_page, page_pipeline, parse_limit
+
+app = Quart(__name__)
+app.json = MongoJSONProvider(app)
+
+hasher = PasswordHasher(rounds=int(os.environ.get("AURACARE_BCRYPT_ROUNDS", "12")))
+# in-process only: a Redis round trip would block the event loop
+known_sessions = KnownSessions(TTLCache(maxsize=int(os.environ.get("AURACARE_SESSION_CACHE_SIZE", "50000")),
+                                        ttl=int(os.environ.get("AURACARE_SESSION_CACHE_TTL", "86400"))))
+client = None
+db     = None
+
+
+@app.before_serving
+async def connect():
+    global client, db
+    # one pool per worker process, created on the serving event loop
+    client = AsyncIOMotorClient(mongo.MONGO_URI, **mongo.client_options())
+    db = client[mongo.DB_NAME]
+    await asyncio.to_thread(bootstrap_indexes, mongo.get_db())
+
+
+@app.after_serving
+async def disconnect():
+    client.close()
+
+
+@app.after_request
+async def allow_cors(response):
+    # same wide-open policy as CORS(app) on the WSGI server
+    response.headers.setdefault("Access-Control-Allow-Origin", "*")
+    if request.method == "OPTIONS":
+        response.headers["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "*")
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    return response
+
+
+def busy_response():
+    resp = jsonify({"error": "Server busy, please retry"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
+async def ensure_sessions(docs):
+    new = known_sessions.unseen(docs)
+    if new:
+        await db.sessions.bulk_write(
+            [UpdateOne(*session_upsert_spec(d), upsert=True) for d in new.values()],
+            ordered=False
+        )
+        known_sessions.mark(new)
+
+
+async def keyed_payload():
+    # an Idempotency-Key header works as well as "event_key" in the body
+    data = await request.get_json() or {}
+    key  = request.headers.get("Idempotency-Key")
+    if key and not data.get("event_key"):
+        data["event_key"] = key
+    return data
+
+
+async def bump_catalog(name):
+    # same counter the WSGI catalog cache watches, so both servers stay coherent
+    await db.catalog_versions.update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+
+
+# --------------------- Signup ---------------------
+@app.route('/api/signup', methods=['POST'])
+async def signup():
+    data = await request.get_json() or {}
+    name, email, password, avatar = (
+        data.get("name"),
+        data.get("email"),
+        data.get("password"),
+        data.get("avatar")
+    )
+
+    if not name or not email or not password:
+        return jsonify({"error": "Missing required fields"}), 400
+
+    if await db.users.find_one({"email": email}, {"_id": 1}):
+        return jsonify({"message": "Email already exists"}), 409
+
+    try:
+        hashed = await asyncio.wait_for(asyncio.wrap_future(hasher.hash_future(password)), hasher.timeout)
+    except (HasherBusy, asyncio.TimeoutError):   # queue full, or stuck behind it past the timeout
+        return busy_response()
+    user_doc = {
+        "name": name,
+        "email": email,
+        "password": hashed,
+        "avatar": avatar,
+        "is_profile_complete": False
+    }
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # lost the race with a concurrent signup for the same email
+        return jsonify({"message": "Email already exists"}), 409
+    user_doc.pop("password")
+    return jsonify(user_doc), 201
+
+# --------------------- Login ---------------------
+@app.route('/api/login', methods=['POST'])
+async def login():
+    data = await request.get_json() or {}
+    email, password = data.get("email"), data.get("password")
+    if not email or not password:
+        return jsonify({"error": "Missing email or password"}), 400
+
+    user = await db.users.find_one({"email": email})
+    try:
+        ok = bool(user) and await asyncio.wait_for(
+            asyncio.wrap_future(hasher.verify_future(password, user["password"])), hasher.timeout)
+    except (HasherBusy, asyncio.TimeoutError):
+        return busy_response()
+    if ok:
+        user.pop("password")
+        return jsonify({"message": "Login successful", "user": user}), 200
+
+    return jsonify({"error": "Invalid email or password"}), 401
+
+# --------------------- Log Chat Message ---------------------
+@app.route('/api/log-message', methods=['POST'])
+async def log_message():
+    msg_doc, error = build_message_doc(await keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+
+    # the session upsert and the insert don't depend on each other
+    try:
+        await asyncio.gather(
+            ensure_sessions([msg_doc]),
+            db.messages.insert_one(msg_doc),
+        )
+    except DuplicateKeyError:
+        return jsonify({"success": True, "duplicate": True, "message": "Message already logged"}), 200
+    return jsonify({"success": True, "message": "Message logged"}), 200
+
+# --------------------- Fetch Session Messages ---------------------
+@app.route('/api/session-messages', methods=['POST'])
+async def get_session_messages():
+    data       = await request.get_json() or {}
+    email      = data.get("email")      or data.get("userEmail")
+    session_id = data.get("session_id") or data.get("sessionId")
+    if not email or not session_id:
+        return jsonify({"error": "Missing email or session_id"}), 400
+
+    query = {"email": email, "session_id": session_id}
+    page  = None
+    if any(data.get(k) for k in ("limit", "before", "after")):
+        try:
+            limit = parse_limit(data.get("limit"))
+            pipeline = page_pipeline(query, limit, data.get("before"), data.get("after"), MESSAGE_FIELDS)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        docs = await db.messages.aggregate(pipeline).to_list(None)
+        messages, page = finish_page(docs, limit, data.get("before"), data.get("after"))
+    else:
+        messages = await db.messages.find(query, MESSAGE_FIELDS).sort("timestamp", 1).to_list(None)
+
+    resp = {"success": True, "messages": messages}
+    if page:
+        resp["page"] = page
+    return jsonify(resp), 200
+
+# --------------------- User’s Sessions List ---------------------
+@app.route('/api/sessions/<email>', methods=['GET'])
+async def get_user_sessions(email):
+    sessions = await db.sessions.aggregate(sessions_pipeline(email)).to_list(None)
+    return jsonify({"success": True, "sessions": sessions}), 200
+
+@app.route('/api/sessions/<email>/summary', methods=['GET'])
+async def get_session_summaries(email):
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    sessions = await db.messages.aggregate(session_summary_pipeline(email, limit)).to_list(None)
+    return jsonify({"success": True, "sessions": sessions}), 200
+
+# --------------------- Mood Logging ---------------------
+@app.route('/api/mood-log', methods=['POST'])
+async def log_mood():
+    mood_doc, error = build_mood_doc(await keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+
+    # the rollup waits for the insert so a repeated event_key isn't counted twice
+    try:
+        await asyncio.gather(
+            ensure_sessions([mood_doc]),
+            db.mood_logs.insert_one(mood_doc),
+        )
+    except DuplicateKeyError:
+        # the first try may have stopped before its rollup update; recount on the sync driver
+        await asyncio.to_thread(rollups.refresh_duplicates, db.delegate, [mood_doc])
+        return jsonify({"success": True, "duplicate": True, "message": "Mood already logged"}), 200
+    await db.mood_daily.bulk_write([rollups.mood_update(mood_doc)])
+    return jsonify({"success": True, "message": "Mood logged with emotion"}), 200
+
+# --------------------- Quiz CRUD Endpoints ---------------------
+@app.route('/api/quiz', methods=['GET'])
+async def list_quizzes():
+    quizzes = await db.quiz.aggregate(QUIZ_PIPELINE).to_list(None)
+    return jsonify({"success": True, "questions": quizzes}), 200
+
+@app.route('/api/quiz', methods=['POST'])
+async def create_quiz():
+    data = await request.get_json() or {}
+    res = await db.quiz.insert_one(quiz_fields(data, for_insert=True))
+    if res.inserted_id:
+        await bump_catalog("quiz")
+        return jsonify({"success": True, "id": str(res.inserted_id)}), 201
+    return jsonify({"success": False}), 500
+
+@app.route('/api/quiz/<quiz_id>', methods=['PUT'])
+async def update_quiz(quiz_id):
+    data = await request.get_json() or {}
+    result = await db.quiz.update_one({"_id": ObjectId(quiz_id)}, {"$set": quiz_fields(data)})
+    if result.modified_count:
+        await bump_catalog("quiz")
+        return jsonify({"success": True}), 200
+    return jsonify({"success": False}), 200
+
+@app.route('/api/quiz/<quiz_id>', methods=['DELETE'])
+async def delete_quiz(quiz_id):
+    result = await db.quiz.delete_one({"_id": ObjectId(quiz_id)})
+    if result.deleted_count:
+        await bump_catalog("quiz")
+        return jsonify({"success": True}), 200
+    return jsonify({"success": False}), 404
+
+# ————— Music —————
+@app.route('/api/music', methods=['GET'])
+async def list_music():
+    music = await db.music.aggregate(MUSIC_PIPELINE).to_list(None)
+    return jsonify({'success': True, 'music': music}), 200
+
+@app.route('/api/music', methods=['POST'])
+async def create_music():
+    data = await request.get_json() or {}
+    new = {k: data[k] for k in MUSIC_FIELDS}
+    await db.music.insert_one(new)
+    await bump_catalog('music')
+    new['id'] = new.pop('_id')
+    return jsonify({'success': True, 'music': new}), 201
+
+@app.route('/api/music/<string:music_id>', methods=['PUT'])
+async def update_music(music_id):
+    data = await request.get_json() or {}
+    try:
+        oid = ObjectId(music_id)
+    except Exception:
+        return jsonify({'success': False, 'error': 'Invalid id'}), 400
+
+    res = await db.music.update_one({'_id': oid}, {'$set': {k: data.get(k) for k in MUSIC_FIELDS}})
+    if res.modified_count:
+        await bump_catalog('music')
+        return jsonify({'success': True}), 200
+    return jsonify({'success': False, 'error': 'Nothing changed'}), 200
+
+@app.route('/api/music/<string:music_id>', methods=['DELETE'])
+async def delete_music(music_id):
+    try:
+        oid = ObjectId(music_id)
+    except Exception:
+        return jsonify({'success': False, 'error': 'Invalid id'}), 400
+
+    res = await db.music.delete_one({'_id': oid})
+    if res.deleted_count:
+        await bump_catalog('music')
+        return jsonify({'success': True}), 200
+    return jsonify({'success': False, 'error': 'Not found'}), 404
+
+
+if __name__ == '__main__':
+    app.run(port=5001)
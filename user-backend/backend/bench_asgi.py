@@ -0,0 +1,98 @@
+"""WSGI vs ASGI throughput benchmark for the core API.
+
+Drives the same request mix against the Flask server (server.py) and the
+Quart/Motor server (asgi_server.py) with N concurrent clients and prints
+requests/s, p50 and p99 latency and error counts for each. Start both
+servers against the same MongoDB first, e.g.
+
+    python server.py                                   # :5000
+    uvicorn asgi_server:app --port 5001 --workers 4    # :5001
+    python bench_asgi.py --clients 64 --seconds 20
+
+Each run signs up one benchmark user, then loops log-message, mood-log,
+session-messages, sessions and the quiz/music catalogs; `--login` adds
+bcrypt logins to the mix.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+
+import aiohttp
+
+TARGETS = {"wsgi": "http://localhost:5000", "asgi": "http://localhost:5001"}
+
+
+def request_mix(email, session_id, login):
+    mix = [
+        ("POST", "/api/log-message", {"email": email, "sender": "user", "message": "bench", "session_id": session_id}),
+        ("POST", "/api/mood-log", {"email": email, "mood": 6, "session_id": session_id}),
+        ("POST", "/api/session-messages", {"email": email, "session_id": session_id, "limit": 50}),
+        ("GET", f"/api/sessions/{email}", None),
+        ("GET", "/api/quiz", None),
+        ("GET", "/api/music", None),
+    ]
+    if login:
+        mix.append(("POST", "/api/login", {"email": email, "password": "bench-password"}))
+    return mix
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(base_url, clients, seconds, login):
+    email = f"bench-{uuid.uuid4().hex[:8]}@auracare.test"
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(base_url, connector=connector) as http:
+        async with http.post("/api/signup", json={"name": "bench", "email": email, "password": "bench-password"}) as r:
+            await r.read()
+        deadline = time.monotonic() + seconds
+
+        async def client(n):
+            nonlocal errors
+            # every client walks the mix from a different offset
+            mix = request_mix(email, f"bench-{n}", login)
+            for method, path, body in itertools.islice(itertools.cycle(mix), n % len(mix), None):
+                if time.monotonic() >= deadline:
+                    return
+                start = time.perf_counter()
+                try:
+                    async with http.request(method, path, json=body) as r:
+                        await r.read()
+                        if r.status >= 500:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.monotonic()
+        await asyncio.gather(*(client(n) for n in range(clients)))
+        elapsed = time.monotonic() - start
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wsgi", default=TARGETS["wsgi"])
+    parser.add_argument("--asgi", default=TARGETS["asgi"])
+    parser.add_argument("--clients", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--login", action="store_true", help="include bcrypt logins in the mix")
+    args = parser.parse_args()
+
+    print(f"{args.seconds}s per run" + (", with logins" if args.login else ""))
+    print(f"{'server':>6} {'clients':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for clients in args.clients:
+        for name, url in (("wsgi", args.wsgi), ("asgi", args.asgi)):
+            rate, p50, p99, errors = asyncio.run(run(url, clients, args.seconds, args.login))
+            print(f"{name:>6} {clients:>8} {rate:>10.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
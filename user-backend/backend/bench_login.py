@@ -0,0 +1,64 @@
+"""Login throughput benchmark for the bcrypt worker pool.
+
+Simulates concurrent /api/login password checks against PasswordHasher at a
+range of pool sizes and prints verified logins per second plus how many
+attempts were shed with 503. No MongoDB or server needed:
+
+    python bench_login.py --rounds 12 --pools 1 2 4 8 --clients 32 --seconds 5
+"""
+import argparse
+import threading
+import time
+
+import bcrypt
+
+from hashing import HasherBusy, PasswordHasher
+
+
+def run(pool_size, rounds, clients, seconds, max_queue):
+    hasher = PasswordHasher(rounds=rounds, workers=pool_size, max_queue=max_queue)
+    stored = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(rounds))
+    counts = {"ok": 0, "shed": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < deadline:
+            try:
+                hasher.verify("correct horse", stored)
+                key = "ok"
+            except HasherBusy:
+                key = "shed"
+                time.sleep(0.01)
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    hasher.shutdown()
+    return counts["ok"] / elapsed, counts["shed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--pools", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--max-queue", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"bcrypt rounds={args.rounds}, {args.clients} concurrent clients, {args.seconds}s per run")
+    print(f"{'pool':>6} {'logins/s':>10} {'shed':>8}")
+    for pool in args.pools:
+        rate, shed = run(pool, args.rounds, args.clients, args.seconds, args.max_queue)
+        print(f"{pool:>6} {rate:>10.1f} {shed:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Small read-through caches for the API.
+
+TTLCache is an in-process LRU with per-entry expiry. RedisCache has the same
+interface on top of a shared Redis so several workers see one cache (and one
+invalidation). make_cache() picks Redis when AURACARE_REDIS_URL is set.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bson import json_util
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend":   "memory",
+            "size":      len(self),
+            "maxsize":   self.maxsize,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "hit_rate":  round(self.hits / total, 3) if total else None,
+        }
+
+
+class RedisCache:
+    """Shared cache in Redis; values are stored as extended JSON."""
+
+    def __init__(self, client, namespace, ttl=300):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"auracare:{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        raw = self.client.get(self._key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json_util.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._key(key), json_util.dumps(value), ex=int(self.ttl if ttl is None else ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self._key(k) for k in keys))
+
+    def clear(self):
+        for k in self.client.scan_iter(self._key("*")):
+            self.client.delete(k)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend":  "redis",
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+_redis_client = None
+
+
+def make_cache(namespace, maxsize=1024, ttl=300):
+    """Redis-backed cache if AURACARE_REDIS_URL is set, else in-process."""
+    global _redis_client
+    url = os.environ.get("AURACARE_REDIS_URL")
+    if not url:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(url)
+    return RedisCache(_redis_client, namespace, ttl=ttl)
+
+
+class KnownSessions:
+    """Session ids already upserted into db.sessions, so repeats can skip it.
+
+    Sessions are never deleted, so a cached id can't go stale; the TTL only
+    bounds memory. Ids are marked after the upsert succeeds, never before.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def unseen(self, docs):
+        """{session_id: first doc} for the docs whose session isn't known yet."""
+        new = {}
+        for doc in docs:
+            sid = doc["session_id"]
+            if sid not in new and self.cache.get(sid) is None:
+                new[sid] = doc
+        return new
+
+    def mark(self, session_ids):
+        for sid in session_ids:
+            self.cache.set(sid, 1)
+
+    def stats(self):
+        # a cache hit is an upsert we didn't send
+        return self.cache.stats()
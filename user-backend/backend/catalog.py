@@ -0,0 +1,66 @@
+"""Versioned, pre-serialized cache for the quiz and music catalogs.
+
+Each catalog has a version counter in the `catalog_versions` collection that
+the CRUD routes bump. GETs read only that counter (an _id lookup) and, while
+it is unchanged, serve the cached JSON bytes; the version doubles as the
+ETag so unchanged catalogs answer If-None-Match with 304. Keeping the
+counter in MongoDB means every worker sees a bump made by any other.
+"""
+import threading
+
+from flask import Response, request
+
+
+class CatalogCache:
+    def __init__(self, db):
+        self.db = db
+        self._entries = {}   # name -> (version, body bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+        self.not_modified = 0
+
+    def version(self, name):
+        doc = self.db.catalog_versions.find_one({"_id": name})
+        return doc["v"] if doc else 0
+
+    def bump(self, name):
+        """Invalidate `name` everywhere; call after any write to the catalog."""
+        self.db.catalog_versions.update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def body(self, name, build):
+        """(version, bytes) for `name`, calling build() only when stale."""
+        version = self.version(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry
+        body = build()
+        with self._lock:
+            self.rebuilds += 1
+            self._entries[name] = (version, body)
+        return version, body
+
+    def respond(self, name, build):
+        """Conditional JSON response for `name` (200 with ETag, or 304)."""
+        version, body = self.body(name, build)
+        resp = Response(body, mimetype="application/json")
+        resp.set_etag(f"{name}-{version}")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp = resp.make_conditional(request)
+        if resp.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        return resp
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached":       sorted(self._entries),
+                "hits":         self.hits,
+                "rebuilds":     self.rebuilds,
+                "not_modified": self.not_modified,
+            }
@@ -0,0 +1,100 @@
+"""Response compression for the JSON API.
+
+An after_request hook negotiates Accept-Encoding (brotli when the `brotli`
+package is installed, else gzip), leaves small and streamed bodies alone,
+and keeps compressed copies of ETagged responses (the quiz/music catalogs)
+so they are compressed once per version rather than once per request.
+Per-route byte counts and ratios are kept for /api/metrics.
+"""
+import gzip
+import threading
+
+from flask import request
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE = ("application/json", "text/")
+
+
+def _encode(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+class Compressor:
+    def __init__(self, app=None, min_size=MIN_SIZE, cache_size=64):
+        self.min_size = min_size
+        self.encodings = (["br"] if brotli else []) + ["gzip"]
+        self._variants = TTLCache(maxsize=cache_size, ttl=24 * 3600)
+        self._routes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    def _negotiate(self):
+        return request.accept_encodings.best_match(self.encodings)
+
+    def _skip(self, response):
+        return (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE)
+        )
+
+    def compress(self, response):
+        if self._skip(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self._negotiate()
+        if not encoding:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        if etag:
+            key = (etag, encoding)
+            body = self._variants.get(key)
+            if body is None:
+                body = _encode(data, encoding)
+                self._variants.set(key, body)
+            # the bytes differ from the identity body, so only a weak match holds
+            response.set_etag(etag, weak=True)
+        else:
+            body = _encode(data, encoding)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        self._record(request.endpoint, len(data), len(body))
+        return response
+
+    def _record(self, endpoint, raw, compressed):
+        with self._lock:
+            stats = self._routes.setdefault(endpoint or "?", {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+            stats["responses"] += 1
+            stats["bytes_in"] += raw
+            stats["bytes_out"] += compressed
+
+    def stats(self):
+        with self._lock:
+            routes = {
+                name: dict(s, ratio=round(s["bytes_in"] / s["bytes_out"], 2) if s["bytes_out"] else None)
+                for name, s in self._routes.items()
+            }
+        return {"encodings": self.encodings, "min_size": self.min_size,
+                "variant_cache": self._variants.stats(), "routes": routes}
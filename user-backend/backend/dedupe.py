@@ -0,0 +1,101 @@
+"""Remove duplicate mood logs and chat messages left by retries.
+
+Rows written before idempotency keys have nothing to dedupe on, so this job
+treats a row as a duplicate when an earlier row of the same user and session
+has the same content (mood + emotion, or sender + message) within
+`--window` seconds. The earliest row is kept. Keyed rows are skipped, the
+unique index already guarantees they are distinct.
+
+    python dedupe.py --dry-run
+    python dedupe.py --window 10
+    python dedupe.py --only messages --dry-run
+
+Only mood_logs is deduped by default. Identical messages close together are
+often real ("ok", "ok", or the bot repeating a fallback line), so messages
+are opt-in with `--only messages`, best after a --dry-run.
+
+Run migrate_timestamps.py first: rows with string timestamps are skipped.
+mood_daily is rebuilt for every user whose mood logs changed.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, MongoClient
+
+import rollups
+
+SIGNATURES = {
+    "mood_logs": ("mood", "emotion"),
+    "messages":  ("sender", "message"),
+}
+# walk each collection in the order of its (email, timestamp...) index, so no in-memory sort
+SORTS = {
+    "mood_logs": [("email", ASCENDING), ("timestamp", ASCENDING)],
+    "messages":  [("email", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+}
+DEFAULT_COLLECTIONS = ("mood_logs",)
+DEFAULT_WINDOW = 10      # seconds
+DELETE_BATCH = 1000
+
+
+def find_duplicates(coll, fields, sort, window):
+    """Yield (email, _id) for every duplicate row, in (email, timestamp) order."""
+    projection = {"email": 1, "session_id": 1, "timestamp": 1, **{f: 1 for f in fields}}
+    cursor = coll.find({"event_key": {"$exists": False}}, projection).sort(sort)
+    email, kept = None, {}           # signature -> timestamp of the row we kept
+    for doc in cursor:
+        if doc.get("email") != email:
+            email, kept = doc.get("email"), {}   # rows arrive grouped by user
+        ts = doc.get("timestamp")
+        if not isinstance(ts, datetime):
+            continue
+        sig = (doc.get("session_id"),) + tuple(repr(doc.get(f)) for f in fields)
+        first = kept.get(sig)
+        if first is not None and ts - first <= window:
+            yield email, doc["_id"]
+        else:
+            kept[sig] = ts
+
+
+def dedupe_collection(db, coll_name, window_seconds=DEFAULT_WINDOW, dry_run=False):
+    """Delete duplicates from one collection; returns (removed, affected emails)."""
+    coll = db[coll_name]
+    window = timedelta(seconds=window_seconds)
+    removed, emails, batch = 0, set(), []
+    for email, _id in find_duplicates(coll, SIGNATURES[coll_name], SORTS[coll_name], window):
+        emails.add(email)
+        batch.append(_id)
+        if len(batch) >= DELETE_BATCH:
+            removed += len(batch) if dry_run else coll.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        removed += len(batch) if dry_run else coll.delete_many({"_id": {"$in": batch}}).deleted_count
+
+    if coll_name == "mood_logs" and not dry_run:
+        for email in emails:
+            rollups.rebuild(db, email)
+    return removed, emails
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove duplicate AuraCare mood logs and messages")
+    parser.add_argument("--only", choices=sorted(SIGNATURES), action="append",
+                        help=f"collections to dedupe (repeatable), default {', '.join(DEFAULT_COLLECTIONS)}")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW,
+                        help="seconds within which identical rows count as duplicates")
+    parser.add_argument("--dry-run", action="store_true", help="count duplicates, delete nothing")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="auracare")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+    for coll_name in args.only or DEFAULT_COLLECTIONS:
+        removed, emails = dedupe_collection(db, coll_name, args.window, args.dry_run)
+        verb = "would remove" if args.dry_run else "removed"
+        print(f"✅ {coll_name}: {verb} {removed} duplicates across {len(emails)} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
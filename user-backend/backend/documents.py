@@ -0,0 +1,234 @@
+"""Document builders and query shapes shared by the WSGI and ASGI servers.
+
+Everything here is pure — no client, no request — so server.py and
+asgi_server.py validate payloads and shape responses identically.
+"""
+import math
+from datetime import datetime, timezone
+
+
+# --------------------- Timestamps ---------------------
+def parse_timestamp(value):
+    """Naive-UTC datetime for a client timestamp, or None if it can't be read.
+
+    Takes datetimes, ISO-8601 strings with or without an offset (the "...Z"
+    from JS toISOString) and epoch seconds or milliseconds. Values without a
+    timezone are taken as UTC, which is also how pymongo stores naive ones.
+    """
+    if isinstance(value, datetime):
+        ts = value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if abs(value) > 1e11 else value   # Date.now() is ms
+        try:
+            ts = datetime.fromtimestamp(seconds, timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    elif isinstance(value, str):
+        try:
+            ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    # BSON dates keep milliseconds; truncate now so cursors round-trip exactly
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+def isoformat_utc(ts):
+    """ISO-8601 with a trailing Z for a stored datetime.
+
+    Naive values are UTC (that's how they're stored); without the Z a browser's
+    `new Date(...)` would read them as local time.
+    """
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.isoformat() + "Z"
+
+
+# --------------------- Idempotency Keys ---------------------
+MAX_EVENT_KEY_LENGTH = 200
+
+
+def event_key(data, reserve=0):
+    """(key, error) for an optional client idempotency key ("event_key").
+
+    `reserve` leaves room for suffixes a caller derives from the key.
+    """
+    key = data.get("event_key") or data.get("idempotency_key")
+    if key is None:
+        return None, None
+    if not isinstance(key, str) or len(key) > MAX_EVENT_KEY_LENGTH - reserve:
+        return None, "Invalid event_key"
+    return key, None
+
+
+def _with_key(doc, key):
+    # only keyed docs carry the field, so the partial unique index ignores the rest
+    if key is not None:
+        doc["event_key"] = key
+    return doc
+
+
+# --------------------- Chat Messages ---------------------
+def build_message_doc(data):
+    # returns (doc, error) so single and batch ingest validate the same way
+    user_email = data.get("email")      or data.get("userEmail")
+    sender     = data.get("sender")
+    message    = data.get("message")
+    session_id = data.get("session_id") or data.get("sessionId")
+    timestamp  = parse_timestamp(data.get("timestamp") or datetime.utcnow())
+
+    if not user_email or not sender or not message or not session_id:
+        return None, "Missing required fields"
+    if timestamp is None:
+        return None, "Invalid timestamp"
+    key, error = event_key(data)
+    if error:
+        return None, error
+    return _with_key({
+        "email":      user_email,
+        "sender":     sender,
+        "message":    message,
+        "session_id": session_id,
+        "timestamp":  timestamp
+    }, key), None
+
+
+def session_upsert_spec(doc):
+    # (filter, update) that makes sure the doc's session is tracked
+    return (
+        {"session_id": doc["session_id"]},
+        {"$setOnInsert": {
+            "session_id": doc["session_id"],
+            "email":      doc["email"],
+            "created_at": doc["timestamp"]
+        }}
+    )
+
+
+MESSAGE_FIELDS = {"sender": 1, "message": 1, "session_id": 1, "timestamp": 1}
+
+
+def sessions_pipeline(email):
+    return [
+        {"$match": {"email": email}},
+        {"$project": {
+            "_id":        0,
+            "id":         "$session_id",
+            "created_at": {"$ifNull": ["$created_at", "$$NOW"]}
+        }}
+    ]
+
+
+# --------------------- Session Summaries ---------------------
+PREVIEW_CHARS = 80
+
+
+def session_summary_pipeline(email, limit):
+    # one pass over the user's messages in (session_id, timestamp) index order
+    return [
+        {"$match": {"email": email}},
+        {"$sort": {"session_id": 1, "timestamp": 1, "_id": 1}},
+        {"$group": {
+            "_id":           "$session_id",
+            "message_count": {"$sum": 1},
+            "created_at":    {"$first": "$timestamp"},
+            "last_activity": {"$last": "$timestamp"},
+            "last_message":  {"$last": "$message"},
+            "last_sender":   {"$last": "$sender"},
+        }},
+        {"$sort": {"last_activity": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id":           0,
+            "id":            "$_id",
+            "created_at":    1,
+            "last_activity": 1,
+            "message_count": 1,
+            "last_message":  {"$cond": [
+                {"$gt": [{"$strLenCP": {"$ifNull": ["$last_message", ""]}}, PREVIEW_CHARS]},
+                {"$concat": [{"$substrCP": ["$last_message", 0, PREVIEW_CHARS - 1]}, "…"]},
+                "$last_message",
+            ]},
+            "last_sender":   1,
+        }},
+    ]
+
+
+# --------------------- Mood Logging ---------------------
+# Auto determine emotion from mood score
+def determine_emotion(mood_score):
+    if mood_score >= 8:
+        return "Happy"
+    elif mood_score >= 5:
+        return "Neutral"
+    elif mood_score >= 3:
+        return "Sad"
+    else:
+        return "Anxious"
+
+
+def build_mood_doc(data):
+    session_id = data.get("session_id") or data.get("sessionId")
+    user_email = data.get("email")      or data.get("userEmail")
+    mood       = data.get("mood")
+    timestamp  = parse_timestamp(data.get("timestamp") or datetime.utcnow())
+
+    if not session_id or not user_email or mood is None:
+        return None, "Missing session_id, email, or mood"
+    # bool is an int subclass; NaN would compare false against every threshold
+    if isinstance(mood, bool) or not isinstance(mood, (int, float)) or not math.isfinite(mood):
+        return None, "Invalid mood"
+    if timestamp is None:
+        return None, "Invalid timestamp"
+    key, error = event_key(data)
+    if error:
+        return None, error
+    return _with_key({
+        "session_id":  session_id,
+        "email":       user_email,
+        "mood":        mood,
+        "emotion":     determine_emotion(mood),  # ✅ Added emotion here
+        "timestamp":   timestamp
+    }, key), None
+
+
+# --------------------- Users ---------------------
+USERS_PIPELINE = [
+    {"$project": {"password": 0}},                            # exclude password
+    {"$addFields": {
+        "role":      {"$ifNull": ["$role", "User"]},          # default role: User
+        "status":    {"$ifNull": ["$status", "Active"]},      # default status: Active
+        "lastLogin": {"$ifNull": ["$lastLogin", None]},       # optional: handle last login if you store it
+    }},
+]
+
+
+# --------------------- Quiz & Music Catalogs ---------------------
+QUIZ_PIPELINE = [{"$project": {
+    "_id":        0,
+    "id":         "$_id",
+    "question":   {"$ifNull": ["$question", None]},
+    "options":    {"$ifNull": ["$options", []]},
+    "answer":     {"$ifNull": ["$answer", None]},
+    "category":   {"$ifNull": ["$category", None]},
+    "difficulty": {"$ifNull": ["$difficulty", None]}
+}}]
+
+
+def quiz_fields(data, for_insert=False):
+    return {
+        "question":   data.get("question"),
+        "options":    data.get("options", []) if for_insert else data.get("options"),
+        "answer":     data.get("answer"),
+        "category":   data.get("category"),
+        "difficulty": data.get("difficulty")
+    }
+
+
+# rename _id to `id` (the JSON provider stringifies the ObjectId)
+MUSIC_PIPELINE = [{'$addFields': {'id': '$_id'}}, {'$project': {'_id': 0}}]
+
+MUSIC_FIELDS = ('title', 'description', 'duration', 'url', 'category')
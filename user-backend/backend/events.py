@@ -0,0 +1,198 @@
+"""In-process pub/sub feeding the /api/stream/<email> SSE endpoint.
+
+Writers (log_message, log_mood) publish freshly inserted documents; every
+open stream for that email gets them pushed. Event ids are the documents'
+ObjectIds, so a reconnecting EventSource sends `Last-Event-ID` and the gap is
+replayed straight from MongoDB.
+
+ObjectIds don't commit in order: another worker, or the write-behind buffer
+(ids are assigned when a row is queued, the insert lands a flush later), can
+commit a lower id after a higher one was already sent. Replay therefore
+starts REPLAY_OVERLAP_SECONDS behind the last id, so events in that window
+may arrive twice; clients drop ids they've already seen.
+
+Replay is capped at REPLAY_LIMIT documents per collection. A client further
+behind than that (or sending a made-up id) gets a single `reset` event
+instead and should reload what it shows from the REST endpoints.
+
+Subscribers block on a queue, so under a threaded server each open tab holds
+a thread. gunicorn.conf.py runs gevent workers when gevent is installed,
+which keeps thousands of idle streams per worker: the threading primitives
+used here are cooperative once monkey-patched.
+
+The bus only sees writes made by its own process. With several workers, set
+AURACARE_CHANGE_STREAM=1 to feed it from a MongoDB change stream instead
+(requires a replica set). The change stream reconnects after errors and
+stepdowns, resuming after the last change it delivered.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from documents import isoformat_utc
+
+STREAM_COLLECTIONS = {"messages": "message", "mood_logs": "mood"}
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_OVERLAP_SECONDS = float(os.environ.get("AURACARE_REPLAY_OVERLAP", "10"))
+REPLAY_LIMIT = 500
+EPOCH = datetime.fromtimestamp(0, timezone.utc)   # ObjectIds can't go lower
+CHANGE_STREAM_RETRY_SECONDS = 1      # first reconnect delay, doubled up to...
+CHANGE_STREAM_MAX_RETRY_SECONDS = 30
+CHANGE_STREAM_HISTORY_LOST = 286     # the resume token already fell off the oplog
+
+
+def event_payload(doc):
+    """JSON-safe copy of a messages/mood_logs document."""
+    out = {}
+    for k, v in doc.items():
+        if isinstance(v, ObjectId):
+            v = str(v)
+        elif isinstance(v, datetime):
+            v = isoformat_utc(v)
+        out[k] = v
+    return out
+
+
+def overlap_floor(since, seconds=REPLAY_OVERLAP_SECONDS):
+    """Lowest ObjectId a row committed after `since` was read can still have."""
+    start = since.generation_time
+    return ObjectId.from_datetime(start - min(timedelta(seconds=seconds), start - EPOCH))
+
+
+def format_sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBus:
+    """Fan-out of (event_id, kind, payload) tuples to per-email subscribers."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, email):
+        q = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.setdefault(email, set()).add(q)
+        return q
+
+    def unsubscribe(self, email, q):
+        with self._lock:
+            subs = self._subscribers.get(email)
+            if subs:
+                subs.discard(q)
+                if not subs:
+                    del self._subscribers[email]
+
+    def publish(self, email, kind, doc):
+        with self._lock:
+            subs = list(self._subscribers.get(email, ()))
+        if not subs:
+            return
+        item = (str(doc["_id"]), kind, event_payload(doc))
+        for q in subs:
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                # slow consumer: drop it, the browser reconnects with Last-Event-ID
+                self.unsubscribe(email, q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def replay(db, email, last_event_id):
+    """Yield (event_id, frame) for documents written after `last_event_id`,
+    plus the overlap window behind it."""
+    try:
+        floor = overlap_floor(ObjectId(last_event_id))
+    except Exception:
+        return
+    docs = []
+    for coll_name, kind in STREAM_COLLECTIONS.items():
+        rows = list(db[coll_name].find({"email": email, "_id": {"$gt": floor}})
+                    .sort("_id", 1).limit(REPLAY_LIMIT + 1))
+        if len(rows) > REPLAY_LIMIT:
+            # too far behind to replay; the new id makes the next reconnect resume from here
+            event_id = str(ObjectId())
+            yield event_id, format_sse(event_id, "reset", {})
+            return
+        docs.extend((d["_id"], kind, d) for d in rows)
+    docs.sort(key=lambda t: t[0])
+    for oid, kind, d in docs:
+        yield str(oid), format_sse(str(oid), kind, event_payload(d))
+
+
+def stream(bus, db, email, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """Generator of SSE frames for one client connection."""
+    # subscribe before replaying so nothing written in between is lost
+    q = bus.subscribe(email)
+    replayed = set()
+    try:
+        yield "retry: 3000\n\n"
+        if last_event_id:
+            for event_id, frame in replay(db, email, last_event_id):
+                replayed.add(event_id)
+                yield frame
+        while True:
+            try:
+                item = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            event_id, kind, payload = item
+            if event_id in replayed:
+                continue
+            yield format_sse(event_id, kind, payload)
+    finally:
+        bus.unsubscribe(email, q)
+
+
+def start_change_stream(db, bus):
+    """Feed `bus` from a MongoDB change stream on messages and mood_logs."""
+    pipeline = [{"$match": {
+        "operationType": "insert",
+        "ns.coll": {"$in": list(STREAM_COLLECTIONS)},
+    }}]
+
+    def run():
+        token, delay = None, CHANGE_STREAM_RETRY_SECONDS
+        while True:
+            try:
+                with db.watch(pipeline, resume_after=token) as changes:
+                    delay = CHANGE_STREAM_RETRY_SECONDS
+                    for change in changes:
+                        doc = change["fullDocument"]
+                        email = doc.get("email")
+                        if email:
+                            bus.publish(email, STREAM_COLLECTIONS[change["ns"]["coll"]], doc)
+                        token = changes.resume_token
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # down too long to resume; open tabs catch up with Last-Event-ID
+                    token = None
+                print(f"❌ change stream failed, reconnecting in {delay}s: {e}")
+            except Exception as e:
+                print(f"❌ change stream failed, reconnecting in {delay}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, CHANGE_STREAM_MAX_RETRY_SECONDS)
+
+    t = threading.Thread(target=run, name="mongo-change-stream", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,142 @@
+"""Production runner for the AuraCare API: pre-forked gunicorn workers.
+
+    cd user-backend/backend
+    gunicorn -c gunicorn.conf.py server:app
+
+`python server.py` stays the development server. Every worker is its own
+process with its own GIL, Mongo pool (see mongo.py) and write-behind journal
+slot, so the API scales across all cores.
+
+Inside a worker, requests run on gevent greenlets when gevent is installed
+(`pip install gevent`). That matters for the SSE endpoints:
+/api/stream/<email> stays open for as long as a tab shows Analytics, and
+/api/chat/stream for a whole generation. A greenlet parked on either costs a
+few KB, where under the gthread fallback each one pins one of the worker's
+AURACARE_THREADS threads and a handful of open tabs starves every other call.
+
+Signals to the master:
+    HUP         graceful reload: new workers load the current code, old ones
+                finish in-flight requests (up to the graceful timeout) and exit
+    TERM        graceful shutdown
+    TTIN/TTOU   add/remove one worker
+
+Settings:
+    AURACARE_BIND              address, default 0.0.0.0:5000
+    AURACARE_WORKERS           processes, default: one per CPU
+    AURACARE_WORKER_CLASS      gevent (default when installed) or gthread
+    AURACARE_WORKER_CONNECTIONS  concurrent requests per gevent worker, default 1000
+    AURACARE_THREADS           threads per gthread worker, default 4
+    AURACARE_TIMEOUT           seconds before a silent worker is killed, default 60
+    AURACARE_GRACEFUL_TIMEOUT  drain window on reload/stop, default 30
+    AURACARE_MAX_REQUESTS      recycle a worker after N requests, 0 = never, default 5000
+    AURACARE_REDIS_URL         shared profile cache; without it, more than one worker turns
+                               the profile cache off so profile updates show up everywhere
+    AURACARE_CHANGE_STREAM     1 = feed live updates from a MongoDB change stream (needs a
+                               replica set); without it, an open /api/stream only hears about
+                               writes its own worker handled
+
+Before any worker forks, the master runs a self-check (MongoDB reachable,
+indexes built and query plans index-backed, journal directory writable, change
+streams supported when enabled) and refuses to start if it fails.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get("AURACARE_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("AURACARE_WORKERS", "0")) or multiprocessing.cpu_count()
+
+
+def _default_worker_class():
+    try:
+        import gevent  # noqa: F401 (only checking it's there; the worker patches)
+    except ImportError:
+        return "gthread"
+    return "gevent"
+
+
+worker_class = os.environ.get("AURACARE_WORKER_CLASS") or _default_worker_class()
+if worker_class == "gevent":
+    # patch before on_starting imports pymongo (and with it ssl); the worker's
+    # own patching after fork would be too late for modules already loaded
+    from gevent import monkey
+    monkey.patch_all()
+
+worker_connections = int(os.environ.get("AURACARE_WORKER_CONNECTIONS", "1000"))
+threads = int(os.environ.get("AURACARE_THREADS", "4"))
+timeout = int(os.environ.get("AURACARE_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("AURACARE_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.environ.get("AURACARE_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10   # don't recycle every worker at once
+
+# server.py starts threads at import (write-behind flusher, change stream) and
+# threads don't survive fork, so each worker imports the app itself. This is
+# also what lets HUP pick up new code.
+preload_app = False
+
+# The profile cache is per process unless AURACARE_REDIS_URL points the workers
+# at a shared one; with several in-process copies, a profile update handled by
+# one worker leaves the others serving the old profile until the TTL runs out.
+# Without Redis it's off unless explicitly sized (on_starting warns either way).
+SHARED_CACHE = bool(os.environ.get("AURACARE_REDIS_URL"))
+CHANGE_STREAM = os.environ.get("AURACARE_CHANGE_STREAM") == "1"
+if workers > 1 and not SHARED_CACHE:
+    os.environ.setdefault("AURACARE_PROFILE_CACHE_SIZE", "0")
+
+# one pool per worker: a socket per request thread plus the background threads.
+# Greenlets mostly sit on open streams, not on Mongo; cap their sockets instead
+# of opening one per connection
+os.environ.setdefault("AURACARE_MONGO_POOL", str(threads + 4 if worker_class == "gthread" else 32))
+
+
+def on_starting(server):
+    import indexes
+    import mongo
+
+    try:
+        mongo.ping()
+        indexes.bootstrap(mongo.get_db())
+        if CHANGE_STREAM:
+            mongo.get_db().watch().close()   # fails on a standalone server
+        if os.environ.get("AURACARE_WRITE_BEHIND") == "1":
+            journal = os.environ.get("AURACARE_JOURNAL_DIR", "journal")
+            os.makedirs(journal, exist_ok=True)
+            if not os.access(journal, os.W_OK):
+                raise RuntimeError(f"journal directory {journal} is not writable")
+    except Exception as e:
+        server.log.error("Startup self-check failed: %s", e)
+        sys.exit(1)
+    finally:
+        mongo.close()   # workers open their own clients after fork
+
+    if workers > 1 and not SHARED_CACHE:
+        if os.environ["AURACARE_PROFILE_CACHE_SIZE"] == "0":
+            server.log.warning("%d workers and no AURACARE_REDIS_URL: profile cache disabled, "
+                               "set AURACARE_REDIS_URL to share one between workers", workers)
+        else:
+            server.log.warning("%d workers each cache profiles for up to %ss; updates made through one "
+                               "worker stay invisible to the others until then (set AURACARE_REDIS_URL)",
+                               workers, os.environ.get("AURACARE_PROFILE_CACHE_TTL", "300"))
+
+    if workers > 1 and not CHANGE_STREAM:
+        server.log.warning("%d workers and no AURACARE_CHANGE_STREAM=1: live updates only reach tabs "
+                           "streaming from the worker that handled the write (Analytics falls back to "
+                           "a slow refetch); set it on a replica set", workers)
+
+    if worker_class == "gthread":
+        server.log.warning("gthread workers: every open SSE stream holds one of %d threads per worker; "
+                           "pip install gevent to serve them on greenlets", threads)
+
+    # indexes are done; workers inherit this and skip the bootstrap
+    os.environ["AURACARE_SKIP_BOOTSTRAP"] = "1"
+    server.log.info("Startup self-check passed")
+
+
+def worker_exit(server, worker):
+    import mongo
+
+    api = sys.modules.get("server")
+    if api is not None and api.write_behind:
+        api.write_behind.close()   # final drain so the journal slot is left empty
+    mongo.close()
@@ -0,0 +1,119 @@
+"""Bounded worker pool for bcrypt hashing.
+
+bcrypt releases the GIL while it works, so a thread pool spreads hashes
+across cores without pinning the request thread's interpreter. The pool
+admits at most `workers + max_queue` hashes at once; beyond that callers get
+HasherBusy straight away so the route can answer 503 instead of piling up.
+
+Under gevent workers a monkey-patched ThreadPoolExecutor would run bcrypt on
+greenlets and block the hub, so there the pool is gevent's native-thread one.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+
+
+class HasherBusy(RuntimeError):
+    """Raised when the hashing queue is full."""
+
+
+def hash_rounds(hashed):
+    """Cost factor encoded in a bcrypt hash ($2b$12$...)."""
+    try:
+        return int(hashed[4:6])
+    except (TypeError, ValueError):
+        return None
+
+
+def _thread_pool(workers):
+    try:
+        from gevent import monkey
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(workers)
+    return ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+
+
+class PasswordHasher:
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=None, max_queue=None, timeout=10):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.timeout = timeout
+        self._pool = _thread_pool(self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.shed = 0
+        self.rehashed = 0
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.shed += 1
+            raise HasherBusy("Password hashing queue is full")
+        with self._lock:
+            self._in_flight += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds))
+
+    def hash_future(self, password):
+        """Future for the bcrypt hash of `password` at the configured cost."""
+        return self._submit(self._hash, password)
+
+    def verify_future(self, password, hashed):
+        if isinstance(hashed, str):
+            hashed = hashed.encode()
+        return self._submit(bcrypt.checkpw, password.encode(), hashed)
+
+    def hash(self, password):
+        return self.hash_future(password).result(self.timeout)
+
+    def verify(self, password, hashed):
+        return self.verify_future(password, hashed).result(self.timeout)
+
+    def needs_rehash(self, hashed):
+        if isinstance(hashed, str):
+            hashed = hashed.encode()
+        return hash_rounds(hashed) != self.rounds
+
+    def rehash_async(self, password, on_done):
+        """Hash again at the current cost in the background; skipped when busy."""
+        def done(future):
+            if future.exception() is None:
+                with self._lock:
+                    self.rehashed += 1
+                on_done(future.result())
+        try:
+            self._submit(self._hash, password).add_done_callback(done)
+        except HasherBusy:
+            pass  # next login will try again
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds":    self.rounds,
+                "workers":   self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "shed":      self.shed,
+                "rehashed":  self.rehashed,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,220 @@
+"""MongoDB index bootstrap for the AuraCare API.
+
+Declares the indexes the routes in server.py rely on, creates them
+idempotently and checks with explain() that every route query is served by
+an index scan. Run it directly to manage indexes from the command line:
+
+    python indexes.py ensure
+    python indexes.py verify
+"""
+import argparse
+import sys
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import OperationFailure
+
+
+# --------------------- Index Declarations ---------------------
+# collection -> list of (keys, options)
+# only documents that carry a key are indexed, so unkeyed history is unaffected
+EVENT_KEY_UNIQUE = {
+    "name": "email_event_key_unique",
+    "unique": True,
+    "partialFilterExpression": {"event_key": {"$type": "string"}},
+}
+
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "messages": [
+        # /api/session-messages: {email, session_id} keyset-sorted by (timestamp, _id)
+        ([("email", ASCENDING), ("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+         {"name": "email_session_timestamp_id"}),
+        # /api/message-history: {email, timestamp range} keyset-sorted by (timestamp, _id)
+        ([("email", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+         {"name": "email_timestamp_id"}),
+        # /api/stream/<email> Last-Event-ID replay: {email, _id > last}
+        ([("email", ASCENDING), ("_id", ASCENDING)], {"name": "email_id"}),
+        # client idempotency keys: a retried insert fails with 11000 instead of duplicating
+        ([("email", ASCENDING), ("event_key", ASCENDING)], EVENT_KEY_UNIQUE),
+    ],
+    "sessions": [
+        ([("session_id", ASCENDING)], {"name": "session_id_unique", "unique": True}),
+        ([("email", ASCENDING), ("created_at", DESCENDING)], {"name": "email_created_at"}),
+    ],
+    "mood_logs": [
+        ([("session_id", ASCENDING)], {"name": "session_id"}),
+        ([("email", ASCENDING), ("timestamp", ASCENDING)], {"name": "email_timestamp"}),
+        # /api/mood-logs/email/<email>/delta: {email, _id > since}
+        ([("email", ASCENDING), ("_id", ASCENDING)], {"name": "email_id"}),
+        ([("email", ASCENDING), ("event_key", ASCENDING)], EVENT_KEY_UNIQUE),
+    ],
+    "mood_daily": [
+        ([("email", ASCENDING), ("day", ASCENDING)], {"name": "email_day_unique", "unique": True}),
+    ],
+    "activities": [
+        ([("email", ASCENDING)], {"name": "email"}),
+    ],
+}
+
+# what to do when a unique index can't be built over existing duplicates
+CLEANUP_HINTS = {
+    ("users", "email_unique"):
+        "merge or delete the extra accounts for each of those emails",
+    ("sessions", "session_id_unique"):
+        "keep the oldest sessions document per session_id and delete the rest "
+        "(messages and moods reference the id, not the document)",
+    ("mood_daily", "email_day_unique"):
+        "run `python rollups.py rebuild`",
+}
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+# --------------------- Route Queries To Verify ---------------------
+# (label, collection, filter, sort) — one entry per query shape used by a route
+ROUTE_QUERIES = [
+    ("signup/login/profile", "users", {"email": "probe@example.com"}, None),
+    ("session-messages", "messages",
+     {"email": "probe@example.com", "session_id": "probe"}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("message-history", "messages",
+     {"email": "probe@example.com", "timestamp": {"$gte": 0, "$lt": 1}}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("stream replay", "messages",
+     {"email": "probe@example.com", "_id": {"$gt": ObjectId("000000000000000000000000")}}, [("_id", ASCENDING)]),
+    ("log-message/mood-log session upsert", "sessions", {"session_id": "probe"}, None),
+    ("sessions list", "sessions", {"email": "probe@example.com"}, None),
+    ("session summaries", "messages",
+     {"email": "probe@example.com"}, [("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+    ("mood-logs by session", "mood_logs", {"session_id": "probe"}, None),
+    ("mood-logs by email", "mood_logs", {"email": "probe@example.com"}, None),
+    ("mood-logs delta", "mood_logs",
+     {"email": "probe@example.com", "_id": {"$gt": ObjectId("000000000000000000000000")}}, [("_id", ASCENDING)]),
+    ("mood-daily", "mood_daily",
+     {"email": "probe@example.com", "day": {"$gte": "2000-01-01"}}, [("day", ASCENDING)]),
+    ("activity-summary", "activities", {"email": "probe@example.com"}, None),
+]
+
+
+class IndexVerificationError(RuntimeError):
+    """Raised when a route query is not served by an index."""
+
+
+def duplicate_values(coll, keys, partial=None, limit=5):
+    """Up to `limit` key values held by more than one document."""
+    pipeline = [{"$match": partial}] if partial else []
+    pipeline += [
+        {"$group": {"_id": {field: f"${field}" for field, _ in keys}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [d["_id"] for d in coll.aggregate(pipeline)]
+
+
+def ensure_indexes(db, skipped=None):
+    """Create every declared index. Existing indexes are left untouched.
+
+    A unique index the existing data violates (duplicates from before it
+    existed) is skipped with a warning naming the collection, a few of the
+    duplicates and how to clean them up, instead of stopping the server; its
+    collection is appended to `skipped`.
+    """
+    created = {}
+    for coll_name, specs in INDEXES.items():
+        coll = db[coll_name]
+        created[coll_name] = []
+        for keys, opts in specs:
+            try:
+                created[coll_name].append(coll.create_index(keys, **opts))
+            except OperationFailure as e:
+                if not opts.get("unique") or e.code not in DUPLICATE_KEY_CODES:
+                    raise
+                dupes = duplicate_values(coll, keys, opts.get("partialFilterExpression"))
+                hint = CLEANUP_HINTS.get((coll_name, opts["name"]), "remove the duplicates")
+                print(f"⚠️ {coll_name}.{opts['name']} not built, existing documents have duplicate "
+                      f"values, e.g. {dupes}. To fix: {hint}, then run `python indexes.py ensure`.")
+                if skipped is not None:
+                    skipped.append(coll_name)
+    return created
+
+
+def _plan_stages(plan):
+    """Yield every stage name in a winning plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def _winning_plan(explain):
+    planner = explain.get("queryPlanner", {})
+    return planner.get("winningPlan", {})
+
+
+def verify_query_plans(db, tolerate=()):
+    """Explain each route query and raise if any of them falls back to COLLSCAN.
+
+    Collections in `tolerate` (an index was skipped) only get a warning.
+    """
+    report = []
+    failures = []
+    for label, coll_name, query, sort in ROUTE_QUERIES:
+        cursor = db[coll_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = list(_plan_stages(_winning_plan(cursor.explain())))
+        report.append((label, coll_name, stages))
+        # EOF means the collection doesn't exist yet — nothing to scan.
+        if "COLLSCAN" in stages or not ({"IXSCAN", "IDHACK", "EOF"} & set(stages)):
+            failure = f"{label} ({coll_name}): {' -> '.join(stages) or 'no plan'}"
+            if coll_name in tolerate:
+                print(f"⚠️ not index-backed until the duplicates are cleaned up: {failure}")
+            else:
+                failures.append(failure)
+
+    if failures:
+        raise IndexVerificationError(
+            "Route queries not served by an index:\n  " + "\n  ".join(failures)
+        )
+    return report
+
+
+def bootstrap(db, verify=True):
+    """Startup hook: create indexes and, optionally, verify the query plans."""
+    skipped = []
+    ensure_indexes(db, skipped)
+    if verify:
+        verify_query_plans(db, tolerate=skipped)
+
+
+# --------------------- CLI ---------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage AuraCare MongoDB indexes")
+    parser.add_argument("command", choices=["ensure", "verify", "all"], nargs="?", default="all")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="auracare")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+
+    if args.command in ("ensure", "all"):
+        for coll_name, names in ensure_indexes(db).items():
+            print(f"✅ {coll_name}: {', '.join(names)}")
+
+    if args.command in ("verify", "all"):
+        try:
+            report = verify_query_plans(db)   # strict here: the CLI is how you check a cleanup
+        except IndexVerificationError as e:
+            print(f"❌ {e}")
+            return 1
+        for label, coll_name, stages in report:
+            print(f"✅ {label} ({coll_name}): {' -> '.join(stages)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
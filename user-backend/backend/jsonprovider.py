@@ -0,0 +1,57 @@
+"""Flask JSON provider that understands MongoDB documents.
+
+ObjectId becomes its hex string, datetime its ISO-8601 UTC form ("...Z"),
+date its ISO-8601 form and bytes
+a UTF-8 string (base64 if not valid UTF-8), so routes can hand cursor
+documents straight to jsonify without per-document copy loops. Uses orjson
+when it's installed and falls back to the standard library otherwise.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+from documents import isoformat_utc
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+if orjson is not None:
+    # orjson writes datetimes itself, without calling default; stored ones are naive UTC
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def mongo_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return isoformat_utc(o)
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (bytes, bytearray)):
+        try:
+            return o.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(o).decode("ascii")
+    return DefaultJSONProvider.default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=mongo_default, option=ORJSON_OPTIONS).decode()
+        kwargs.setdefault("default", mongo_default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=mongo_default, option=ORJSON_OPTIONS)
+        else:
+            body = self.dumps(obj) + "\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,101 @@
+"""Streaming Ollama client for /api/chat/stream.
+
+With `"stream": true` Ollama answers with one JSON object per line as tokens
+are generated. stream() yields the text of each chunk as it arrives over a
+pooled keep-alive connection, so the gateway can relay it to the browser
+right away, and records time-to-first-token next to total generation time.
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "http://localhost:11434"
+ANSI_ESCAPE = re.compile(r'\x1b\[.*?m')
+SAMPLES = 500   # recent generations kept for the latency percentiles
+
+
+class LLMUnavailable(RuntimeError):
+    """Ollama failed before or during the generation."""
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 1)
+
+
+class OllamaStreamer:
+    def __init__(self, base_url=DEFAULT_URL, pool_size=32, connect_timeout=3, token_timeout=30, deadline=120):
+        self.url = base_url.rstrip("/") + "/api/generate"
+        self.timeout = (connect_timeout, token_timeout)   # read timeout = longest gap between chunks
+        self.deadline = deadline
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=SAMPLES)
+        self._total = deque(maxlen=SAMPLES)
+        self.streams = 0
+        self.errors = 0
+
+    def stream(self, prompt, model="llama3", **params):
+        """Yield response text chunks; raises LLMUnavailable on failure.
+
+        `params` (temperature, num_predict, ...) are Ollama model options.
+        """
+        payload = {"model": model, "prompt": prompt, "options": params, "stream": True}
+        start = time.perf_counter()
+        first = None
+        try:
+            with self._session.post(self.url, json=payload, stream=True, timeout=self.timeout) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMUnavailable(chunk["error"])
+                    text = ANSI_ESCAPE.sub('', chunk.get("response", ""))
+                    if text:
+                        if first is None:
+                            first = time.perf_counter() - start
+                        yield text
+                    if chunk.get("done"):
+                        break
+                    if time.perf_counter() - start > self.deadline:
+                        raise LLMUnavailable(f"Generation exceeded {self.deadline}s")
+        except (requests.RequestException, ValueError) as e:
+            self._record(first, None)
+            raise LLMUnavailable(str(e)) from e
+        except LLMUnavailable:
+            self._record(first, None)
+            raise
+        self._record(first, time.perf_counter() - start)
+
+    def _record(self, ttft, total):
+        with self._lock:
+            self.streams += 1
+            if total is None:
+                self.errors += 1
+            else:
+                self._total.append(total)
+            if ttft is not None:
+                self._ttft.append(ttft)
+
+    def stats(self):
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            streams, errors = self.streams, self.errors
+        return {
+            "streams":      streams,
+            "errors":       errors,
+            "ttft_p50_ms":  _percentile(ttft, 50),
+            "ttft_p95_ms":  _percentile(ttft, 95),
+            "total_p50_ms": _percentile(total, 50),
+            "total_p95_ms": _percentile(total, 95),
+        }
@@ -0,0 +1,106 @@
+"""Convert string timestamps left by older clients into BSON dates.
+
+Before ingest-time parsing, messages and mood logs kept whatever the client
+sent, so `timestamp` (and the `created_at` copied into sessions) is a mix of
+ISO strings and dates. Range queries and the timestamp indexes only see one
+type, so those rows silently drop out of history. This walks each field in
+_id order in batches, parses with the same rules as ingest, and writes the
+dates back:
+
+    python migrate_timestamps.py                  # all fields
+    python migrate_timestamps.py --dry-run
+    python migrate_timestamps.py --only messages.timestamp --batch-size 5000
+
+Progress is checkpointed per field in the `migrations` collection, so an
+interrupted run picks up where it stopped (--restart starts over). Updates
+match on the original string, so a row rewritten since it was read is left
+alone. Strings that can't be parsed are counted and skipped.
+"""
+import argparse
+import sys
+
+from pymongo import ASCENDING, MongoClient, UpdateOne
+
+from documents import parse_timestamp
+
+FIELDS = (
+    ("messages",  "timestamp"),
+    ("mood_logs", "timestamp"),
+    ("sessions",  "created_at"),
+)
+DEFAULT_BATCH_SIZE = 1000
+
+
+def migrate_field(db, coll_name, field, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, restart=False):
+    """Convert one field; returns the checkpoint document."""
+    key = f"timestamps:{coll_name}.{field}"
+    if restart:
+        db.migrations.delete_one({"_id": key})
+    state = db.migrations.find_one({"_id": key}) or {
+        "_id": key, "last_id": None, "converted": 0, "unparseable": 0, "done": False,
+    }
+    if state["done"] and not restart:
+        return state
+
+    coll = db[coll_name]
+    while True:
+        query = {field: {"$type": "string"}}
+        if state["last_id"] is not None:
+            query["_id"] = {"$gt": state["last_id"]}
+        batch = list(coll.find(query, {field: 1}).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            parsed = parse_timestamp(doc[field])
+            if parsed is None:
+                state["unparseable"] += 1
+                continue
+            updates.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+
+        if updates and not dry_run:
+            state["converted"] += coll.bulk_write(updates, ordered=False).modified_count
+        elif dry_run:
+            state["converted"] += len(updates)
+        state["last_id"] = batch[-1]["_id"]
+        if not dry_run:
+            db.migrations.replace_one({"_id": key}, state, upsert=True)
+        print(f"  {coll_name}.{field}: {state['converted']} converted, "
+              f"{state['unparseable']} unparseable, at {state['last_id']}")
+
+    state["done"] = True
+    if not dry_run:
+        db.migrations.replace_one({"_id": key}, state, upsert=True)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert string timestamps to BSON dates")
+    parser.add_argument("--only", action="append", metavar="COLLECTION.FIELD",
+                        help="limit to these fields (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="count what would change, write nothing")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="auracare")
+    args = parser.parse_args(argv)
+
+    fields = [f for f in FIELDS if not args.only or ".".join(f) in args.only]
+    if not fields:
+        parser.error(f"--only must be one of {', '.join('.'.join(f) for f in FIELDS)}")
+
+    db = MongoClient(args.uri)[args.db]
+    failed = 0
+    for coll_name, field in fields:
+        state = migrate_field(db, coll_name, field, args.batch_size, args.dry_run, args.restart)
+        failed += state["unparseable"]
+        verb = "would convert" if args.dry_run else "converted"
+        print(f"✅ {coll_name}.{field}: {verb} {state['converted']}, {state['unparseable']} unparseable")
+    if failed:
+        print(f"⚠️ {failed} values could not be parsed and were left as strings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
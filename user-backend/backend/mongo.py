@@ -0,0 +1,98 @@
+"""Fork-safe MongoDB client factory.
+
+A MongoClient owns a connection pool and monitor threads, and neither
+survives a fork: a child that inherits its parent's client shares sockets
+with it and has no monitors. get_client() therefore opens one client per
+process, lazily, and opens a fresh one whenever it finds itself in a new PID,
+so a client touched by a pre-fork master is never reused by its workers.
+
+`ForkSafeDatabase` stands in for a module-level `db`: every attribute or item
+lookup goes to the current process's client, so `db.messages.find(...)`
+keeps working unchanged in server.py.
+
+Settings (per process, so size the pool to the worker's thread count):
+
+    AURACARE_MONGO_URI            mongodb://localhost:27017/
+    AURACARE_DB                   auracare
+    AURACARE_MONGO_POOL           maxPoolSize, default 50
+    AURACARE_MONGO_MIN_POOL       minPoolSize, default 0
+    AURACARE_MONGO_WAIT_MS        waitQueueTimeoutMS, default 2000
+    AURACARE_MONGO_TIMEOUT_MS     server selection / connect timeout, default 5000
+    AURACARE_MONGO_SOCKET_MS      socketTimeoutMS, default 30000
+"""
+import os
+import threading
+
+from pymongo import MongoClient
+
+MONGO_URI = os.environ.get("AURACARE_MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME   = os.environ.get("AURACARE_DB", "auracare")
+
+_lock   = threading.Lock()
+_client = None
+_pid    = None
+
+
+def client_options():
+    """Pool and timeout kwargs shared by the pymongo and Motor clients."""
+    env = os.environ.get
+    timeout = int(env("AURACARE_MONGO_TIMEOUT_MS", "5000"))
+    return {
+        "maxPoolSize":              int(env("AURACARE_MONGO_POOL", "50")),
+        "minPoolSize":              int(env("AURACARE_MONGO_MIN_POOL", "0")),
+        "maxIdleTimeMS":            60000,
+        # a request waiting this long for a pooled socket fails instead of queueing forever
+        "waitQueueTimeoutMS":       int(env("AURACARE_MONGO_WAIT_MS", "2000")),
+        "serverSelectionTimeoutMS": timeout,
+        "connectTimeoutMS":         timeout,
+        "socketTimeoutMS":          int(env("AURACARE_MONGO_SOCKET_MS", "30000")),
+        "retryWrites":              True,
+    }
+
+
+def get_client():
+    """This process's MongoClient, opened on first use after any fork."""
+    global _client, _pid
+    pid = os.getpid()
+    if _pid != pid:
+        with _lock:
+            if _pid != pid:
+                # don't close() an inherited client: its sockets are the parent's
+                _client = MongoClient(MONGO_URI, **client_options())
+                _pid = pid
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def close():
+    """Close this process's client (worker shutdown)."""
+    global _client, _pid
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client, _pid = None, None
+
+
+def ping(timeout_ms=2000):
+    """Round-trip to the primary with a throwaway client; raises on failure."""
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=timeout_ms)
+    try:
+        client.admin.command("ping")
+    finally:
+        client.close()
+
+
+class ForkSafeDatabase:
+    """Proxy for the current process's Database (see module docstring)."""
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __repr__(self):
+        return f"ForkSafeDatabase({DB_NAME!r})"
@@ -0,0 +1,28 @@
+"""Opt-in NDJSON streaming for the large list endpoints.
+
+A client sending `Accept: application/x-ndjson` gets one JSON document per
+line, written as the MongoDB cursor yields them, so peak memory stays at one
+cursor batch however large the result set is.
+"""
+from flask import Response, current_app, request
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 200   # documents per cursor round trip
+
+
+def wants_ndjson():
+    # JSON stays the default for */* and missing Accept headers
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(docs):
+    """Stream an iterable (usually a cursor) of documents as NDJSON."""
+    dumps = current_app.json.dumps
+    if hasattr(docs, "batch_size"):
+        docs = docs.batch_size(STREAM_BATCH_SIZE)
+
+    def generate():
+        for doc in docs:
+            yield dumps(doc) + "\n"
+
+    return Response(generate(), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,107 @@
+"""Keyset pagination over (timestamp, _id) for chat history queries.
+
+Cursors are opaque url-safe tokens wrapping the timestamp and _id of the
+boundary document, so a page is fetched with an index range scan instead of
+skip/offset.
+"""
+import base64
+
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SORT_ASC = [("timestamp", 1), ("_id", 1)]
+SORT_DESC = [("timestamp", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token can't be decoded."""
+
+
+def encode_cursor(doc):
+    raw = json_util.dumps({"ts": doc.get("timestamp"), "id": doc["_id"]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return data["ts"], data["id"]
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {token!r}") from e
+
+
+def parse_limit(value):
+    """Clamp a client-supplied page size to [1, MAX_PAGE_SIZE]."""
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f"Invalid limit: {value!r}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _keyset_filter(token, op):
+    ts, oid = decode_cursor(token)
+    return {"$or": [
+        {"timestamp": {op: ts}},
+        {"timestamp": ts, "_id": {op: oid}},
+    ]}
+
+
+def page_pipeline(query, limit=DEFAULT_PAGE_SIZE, before=None, after=None, projection=None):
+    """Aggregation pipeline fetching one keyset page (plus one probe row)."""
+    if before and after:
+        raise InvalidCursor("Use either 'before' or 'after', not both")
+
+    clauses = [query]
+    if before:
+        clauses.append(_keyset_filter(before, "$lt"))
+    if after:
+        clauses.append(_keyset_filter(after, "$gt"))
+    keyset_query = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    sort = SORT_ASC if after else SORT_DESC
+    pipeline = [
+        {"$match": keyset_query},
+        {"$sort": dict(sort)},
+        {"$limit": limit + 1},
+    ]
+    if projection:
+        # _id and timestamp must survive the projection: cursors are built from them
+        pipeline.append({"$project": projection})
+    return pipeline
+
+
+def finish_page(docs, limit, before=None, after=None):
+    """Turn the rows fetched by page_pipeline into (docs, page_info)."""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if not after:
+        docs.reverse()
+
+    page_info = {
+        "limit":    limit,
+        "has_more": has_more,
+        # token to load the page older than this one
+        "before":   encode_cursor(docs[0]) if docs else before,
+        # token to poll for anything newer than this page
+        "after":    encode_cursor(docs[-1]) if docs else after,
+    }
+    return docs, page_info
+
+
+def paginate(collection, query, limit=DEFAULT_PAGE_SIZE, before=None, after=None, projection=None):
+    """Fetch one page of `query` ordered oldest → newest.
+
+    With no cursor the newest page is returned; `before` walks back towards
+    older messages and `after` forward towards newer ones. Returns
+    (docs, page_info) where page_info carries the tokens for the adjacent
+    pages and whether more rows exist in the direction of travel.
+    """
+    pipeline = page_pipeline(query, limit, before, after, projection)
+    docs = list(collection.aggregate(pipeline))
+    return finish_page(docs, limit, before, after)
@@ -0,0 +1,70 @@
+"""Pooled client for the Rasa REST channel, used by /api/chat.
+
+One requests.Session per process keeps up to `pool_size` keep-alive
+connections to Rasa open, so a chat turn skips the TCP (and TLS) handshake
+the browser used to pay on every message.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "http://localhost:5005/webhooks/rest/webhook"
+
+
+class RasaUnavailable(RuntimeError):
+    """Rasa didn't answer, or answered with an error."""
+
+
+def reply_text(message):
+    # same fallback the frontend uses for custom payloads
+    return message.get("text") or (message.get("custom") or {}).get("reply") or ""
+
+
+class RasaClient:
+    def __init__(self, url=DEFAULT_URL, pool_size=32, connect_timeout=3, read_timeout=60):
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self._seconds = 0.0
+
+    def send(self, sender_id, message, metadata=None):
+        """Post one user message; returns Rasa's list of bot messages.
+
+        `metadata` reaches the actions as tracker.latest_message["metadata"].
+        """
+        payload = {"sender": sender_id, "message": message}
+        if metadata:
+            payload["metadata"] = metadata
+        start = time.perf_counter()
+        try:
+            resp = self._session.post(self.url, json=payload, timeout=self.timeout)
+            resp.raise_for_status()
+            replies = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            with self._lock:
+                self.errors += 1
+            raise RasaUnavailable(str(e)) from e
+        finally:
+            with self._lock:
+                self.calls += 1
+                self._seconds += time.perf_counter() - start
+        return replies if isinstance(replies, list) else []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "url":        self.url,
+                "pool_size":  self.pool_size,
+                "calls":      self.calls,
+                "errors":     self.errors,
+                "avg_ms":     round(self._seconds / self.calls * 1000, 1) if self.calls else None,
+            }
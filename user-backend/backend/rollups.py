@@ -0,0 +1,200 @@
+"""Per-user daily mood rollups (the `mood_daily` collection).
+
+log_mood folds every entry into one document per (email, day) with atomic
+$inc/$min/$max upserts, so the analytics charts read O(days) documents
+instead of every raw mood row. Rebuild from `mood_logs` with:
+
+    python rollups.py rebuild [--email someone@example.com]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+DEFAULT_DAYS = 30
+REFRESH_ATTEMPTS = 5
+
+
+def day_key(timestamp):
+    """YYYY-MM-DD for a datetime or ISO-8601 string timestamp."""
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return timestamp[:10]
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def _rollup_spec(mood_doc):
+    mood, emotion = mood_doc["mood"], mood_doc["emotion"]
+    return (
+        {"email": mood_doc["email"], "day": day_key(mood_doc["timestamp"])},
+        {
+            # v: version for refresh_days' compare-and-replace
+            "$inc": {"count": 1, "sum": mood, f"emotions.{emotion}": 1, "v": 1},
+            "$min": {"min": mood},
+            "$max": {"max": mood},
+        },
+    )
+
+
+def record_mood(db, mood_doc):
+    """Fold one mood_logs document into that day's rollup."""
+    db.mood_daily.update_one(*_rollup_spec(mood_doc), upsert=True)
+
+
+def mood_update(mood_doc):
+    """Same as record_mood, as an UpdateOne for bulk_write."""
+    return UpdateOne(*_rollup_spec(mood_doc), upsert=True)
+
+
+def refresh_days(db, days):
+    """Recompute the rollups of these (email, "YYYY-MM-DD") pairs from mood_logs.
+
+    Unlike the $inc upserts this is idempotent, so it's what a retried or
+    replayed write uses when it can't tell which moods were already counted.
+    The replace only applies if the rollup's version is unchanged since the
+    recount started, so a concurrent $inc is never overwritten; the day is
+    recounted instead. A mood inserted before the recount whose $inc lands
+    after it is still counted twice (`python rollups.py rebuild` fixes that).
+    """
+    for email, day in days:
+        for _ in range(REFRESH_ATTEMPTS):
+            if _refresh_day(db, email, day):
+                break
+        else:
+            print(f"⚠️ mood_daily {email} {day} kept changing while being recounted; "
+                  f"run `python rollups.py rebuild --email {email}`")
+
+
+def _refresh_day(db, email, day):
+    """One compare-and-replace attempt; False if the rollup changed meanwhile."""
+    key = {"email": email, "day": day}
+    current = db.mood_daily.find_one(key, {"v": 1})
+    version = current.get("v") if current else None
+    guard = {**key, "v": version}   # None also matches rollups without a version
+    start = datetime.strptime(day, "%Y-%m-%d")
+    groups = list(db.mood_logs.aggregate([
+        {"$match": {"email": email, "timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}},
+        {"$group": {
+            "_id":   "$emotion",
+            "count": {"$sum": 1},
+            "sum":   {"$sum": "$mood"},
+            "min":   {"$min": "$mood"},
+            "max":   {"$max": "$mood"},
+        }},
+    ]))
+    if not groups:
+        return current is None or db.mood_daily.delete_one(guard).deleted_count == 1
+
+    emotions = {}
+    for g in groups:
+        name = g["_id"] or "Neutral"
+        emotions[name] = emotions.get(name, 0) + g["count"]
+    try:
+        res = db.mood_daily.replace_one(guard, {
+            **key,
+            "count":    sum(g["count"] for g in groups),
+            "sum":      sum(g["sum"] for g in groups),
+            "min":      min(g["min"] for g in groups),
+            "max":      max(g["max"] for g in groups),
+            "emotions": emotions,
+            "v":        (version or 0) + 1,
+        }, upsert=current is None)
+    except DuplicateKeyError:
+        return False   # an $inc created the day in the meantime
+    return current is None or res.matched_count == 1
+
+
+def refresh_duplicates(db, mood_docs):
+    """refresh_days for the moods these keyed retries collided with.
+
+    The first attempt may have inserted its mood and then failed before the
+    rollup update, so a duplicate can't assume its mood was counted. The
+    stored rows are looked up because a retry's timestamp can differ.
+    """
+    stored = db.mood_logs.find(
+        {"$or": [{"email": d["email"], "event_key": d["event_key"]} for d in mood_docs]},
+        {"email": 1, "timestamp": 1}
+    )
+    refresh_days(db, {(d["email"], day_key(d["timestamp"])) for d in stored})
+
+
+def daily_series(db, email, days=DEFAULT_DAYS):
+    """Line-chart points and pie-chart emotion totals for the last `days` days."""
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    docs = db.mood_daily.find(
+        {"email": email, "day": {"$gte": since}},
+        {"_id": 0, "email": 0}
+    ).sort("day", 1)
+
+    series = []
+    emotions = {}
+    for d in docs:
+        series.append({
+            "day":   d["day"],
+            "count": d["count"],
+            "avg":   round(d["sum"] / d["count"], 2) if d["count"] else None,
+            "min":   d.get("min"),
+            "max":   d.get("max"),
+        })
+        for name, n in d.get("emotions", {}).items():
+            emotions[name] = emotions.get(name, 0) + n
+
+    pie = [{"name": name, "value": n} for name, n in emotions.items()]
+    return series, pie
+
+
+def rebuild(db, email=None):
+    """Recompute rollups from raw mood_logs (for history logged before rollups)."""
+    match = {"email": email} if email else {"email": {"$exists": True}}
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$timestamp"}}}
+    db.mood_daily.delete_many(match)
+    db.mood_logs.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id":   {"email": "$email", "day": day, "emotion": "$emotion"},
+            "count": {"$sum": 1},
+            "sum":   {"$sum": "$mood"},
+            "min":   {"$min": "$mood"},
+            "max":   {"$max": "$mood"},
+        }},
+        {"$group": {
+            "_id":      {"email": "$_id.email", "day": "$_id.day"},
+            "count":    {"$sum": "$count"},
+            "sum":      {"$sum": "$sum"},
+            "min":      {"$min": "$min"},
+            "max":      {"$max": "$max"},
+            "emotions": {"$push": {"k": {"$ifNull": ["$_id.emotion", "Neutral"]}, "v": "$count"}},
+        }},
+        {"$project": {
+            "_id":      0,
+            "email":    "$_id.email",
+            "day":      "$_id.day",
+            "count":    1,
+            "sum":      1,
+            "min":      1,
+            "max":      1,
+            "emotions": {"$arrayToObject": "$emotions"},
+        }},
+        {"$merge": {"into": "mood_daily", "on": ["email", "day"], "whenMatched": "replace"}},
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage AuraCare mood_daily rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--email")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="auracare")
+    args = parser.parse_args(argv)
+
+    rebuild(MongoClient(args.uri)[args.db], args.email)
+    print("✅ mood_daily rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
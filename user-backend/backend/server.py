@@ -1,19 +1,97 @@
-from flask import Flask, request, jsonify
+import os
+import time
+
+import requests
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
-import bcrypt
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
 from bson import ObjectId
 
+import events
+import mongo
+from cache import KnownSessions, make_cache
+from catalog import CatalogCache
+from compression import Compressor
+from documents import (MESSAGE_FIELDS, MUSIC_PIPELINE, QUIZ_PIPELINE, USERS_PIPELINE,
+                       build_message_doc, build_mood_doc, event_key, quiz_fields,
+                       session_summary_pipeline, session_upsert_spec, sessions_pipeline)
+from hashing import HasherBusy, PasswordHasher
+import rollups
+from indexes import bootstrap as bootstrap_indexes
+from llm_stream import DEFAULT_URL as DEFAULT_OLLAMA_URL, LLMUnavailable, OllamaStreamer
+from rasa_gateway import DEFAULT_URL as DEFAULT_RASA_URL, RasaClient, RasaUnavailable, reply_text
+from pagination import InvalidCursor, paginate, parse_limit
+from jsonprovider import MongoJSONProvider
+from ndjson import ndjson_response, wants_ndjson
+from writebehind import WriteBehindBuffer, claim_journal_dir
+
 
 app = Flask(__name__)
+app.json_provider_class = MongoJSONProvider   # ObjectId/datetime/bytes handled by jsonify
+app.json = MongoJSONProvider(app)
 CORS(app)
-
-# MongoDB setup
-client = MongoClient("mongodb://localhost:27017/")
-db     = client["auracare"]
-users_collection = db.users  # ✅ add this line
-quiz_col = db["quiz"]   
+compressor = Compressor(app, min_size=int(os.environ.get("AURACARE_COMPRESS_MIN_SIZE", "1024")))
+
+# MongoDB setup: each process opens its own pool on first use (safe under pre-fork)
+db     = mongo.ForkSafeDatabase()
+
+# create route indexes and fail loudly if a query would COLLSCAN
+# (gunicorn.conf.py runs this once in the master and sets AURACARE_SKIP_BOOTSTRAP)
+if os.environ.get("AURACARE_SKIP_BOOTSTRAP") != "1":
+    bootstrap_indexes(db)
+
+# bcrypt runs in a bounded pool; a full queue sheds with 503
+hasher = PasswordHasher(
+    rounds=int(os.environ.get("AURACARE_BCRYPT_ROUNDS", "12")),
+    workers=int(os.environ.get("AURACARE_HASH_WORKERS", "0")) or None,
+    max_queue=int(os.environ["AURACARE_HASH_QUEUE"]) if "AURACARE_HASH_QUEUE" in os.environ else None,
+)
+
+def busy_response():
+    resp = jsonify({"error": "Server busy, please retry"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+# user profile documents (no password) keyed by email, plus the admin list
+profile_cache = make_cache("profiles",
+                           maxsize=int(os.environ.get("AURACARE_PROFILE_CACHE_SIZE", "10000")),
+                           ttl=int(os.environ.get("AURACARE_PROFILE_CACHE_TTL", "300")))
+ALL_USERS_KEY = "__all_users__"
+
+def invalidate_user(email):
+    # call after every write to db.users
+    profile_cache.delete(email, ALL_USERS_KEY)
+
+# sessions already upserted; only a session's first event has to write db.sessions
+known_sessions = KnownSessions(make_cache("sessions",
+                               maxsize=int(os.environ.get("AURACARE_SESSION_CACHE_SIZE", "50000")),
+                               ttl=int(os.environ.get("AURACARE_SESSION_CACHE_TTL", "86400"))))
+
+def ensure_sessions(docs):
+    new = known_sessions.unseen(docs)
+    if new:
+        db.sessions.bulk_write(
+            [UpdateOne(*session_upsert_spec(d), upsert=True) for d in new.values()],
+            ordered=False
+        )
+        known_sessions.mark(new)
+
+# pre-serialized quiz/music catalogs, versioned by their CRUD routes
+catalogs = CatalogCache(db)
+
+# live updates for /api/stream/<email>
+event_bus = events.EventBus()
+USE_CHANGE_STREAM = os.environ.get("AURACARE_CHANGE_STREAM") == "1"
+if USE_CHANGE_STREAM:
+    events.start_change_stream(db, event_bus)
+
+def publish_event(email, kind, doc):
+    # with a change stream the bus is fed from Mongo, so don't double-publish
+    if not USE_CHANGE_STREAM:
+        event_bus.publish(email, kind, doc)
 
 # --------------------- Signup ---------------------
 @app.route('/api/signup', methods=['POST'])
@@ -32,7 +110,10 @@ def signup():
     if db.users.find_one({"email": email}):
         return jsonify({"message": "Email already exists"}), 409
 
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    try:
+        hashed = hasher.hash(password)
+    except (HasherBusy, FutureTimeout):   # queue full, or stuck behind it past the timeout
+        return busy_response()
     user_doc = {
         "name": name,
         "email": email,
@@ -40,7 +121,12 @@ def signup():
         "avatar": avatar,
         "is_profile_complete": False
     }
-    res = db.users.insert_one(user_doc)
+    try:
+        res = db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # lost the race with a concurrent signup for the same email
+        return jsonify({"message": "Email already exists"}), 409
+    invalidate_user(email)
     if res.inserted_id:
         user_doc.pop("password")
         user_doc["_id"] = str(res.inserted_id)
@@ -57,7 +143,15 @@ def login():
         return jsonify({"error": "Missing email or password"}), 400
 
     user = db.users.find_one({"email": email})
-    if user and bcrypt.checkpw(password.encode(), user["password"]):
+    try:
+        ok = bool(user) and hasher.verify(password, user["password"])
+    except (HasherBusy, FutureTimeout):
+        return busy_response()
+    if ok:
+        if hasher.needs_rehash(user["password"]):
+            # work factor changed since this hash was made: upgrade it quietly
+            hasher.rehash_async(password, lambda new_hash, uid=user["_id"]: db.users.update_one(
+                {"_id": uid}, {"$set": {"password": new_hash}}))
         user["_id"] = str(user["_id"])
         user.pop("password")
         return jsonify({"message": "Login successful", "user": user}), 200
@@ -67,10 +161,12 @@ def login():
 # --------------------- Fetch Profile ---------------------
 @app.route('/profile/<email>', methods=['GET'])
 def get_profile(email):
-    user = db.users.find_one({"email": email}, {"password": 0})
-    if not user:
-        return jsonify({"success": False, "message": "User not found"}), 404
-    user["_id"] = str(user["_id"])
+    user = profile_cache.get(email)
+    if user is None:
+        user = db.users.find_one({"email": email}, {"password": 0})
+        if not user:
+            return jsonify({"success": False, "message": "User not found"}), 404
+        profile_cache.set(email, user)
     return jsonify({"success": True, "data": user}), 200
 
 # --------------------- Update Profile ---------------------
@@ -90,42 +186,43 @@ def update_profile():
     }
     res = db.users.update_one({"email": email}, {"$set": update})
     if res.modified_count:
+        invalidate_user(email)
         return jsonify({"success": True, "message": "Profile updated successfully"}), 200
     return jsonify({"success": False, "message": "No profile changes made"}), 200
 
 # --------------------- Log Chat Message ---------------------
-@app.route('/api/log-message', methods=['POST'])
-def log_message():
-    data       = request.get_json() or {}
-    user_email = data.get("email")      or data.get("userEmail")
-    sender     = data.get("sender")
-    message    = data.get("message")
-    session_id = data.get("session_id") or data.get("sessionId")
-    timestamp  = data.get("timestamp")  or datetime.utcnow()
+DUPLICATE_KEY = 11000
 
-    if not user_email or not sender or not message or not session_id:
-        return jsonify({"error": "Missing required fields"}), 400
+def keyed_payload():
+    # an Idempotency-Key header works as well as "event_key" in the body
+    data = request.get_json() or {}
+    key  = request.headers.get("Idempotency-Key")
+    if key and not data.get("event_key"):
+        data["event_key"] = key
+    return data
 
-    # ensure session tracked
-    db.sessions.update_one(
-        {"session_id": session_id},
-        {"$setOnInsert": {
-            "session_id": session_id,
-            "email":      user_email,
-            "created_at": timestamp
-        }},
-        upsert=True
-    )
-    db.messages.insert_one({
-        "email":      user_email,
-        "sender":     sender,
-        "message":    message,
-        "session_id": session_id,
-        "timestamp":  timestamp
-    })
+@app.route('/api/log-message', methods=['POST'])
+def log_message():
+    msg_doc, error = build_message_doc(keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+
+    if write_behind:
+        write_behind.append("message", msg_doc)   # repeated keys are dropped at flush
+    else:
+        ensure_sessions([msg_doc])
+        try:
+            db.messages.insert_one(msg_doc)
+        except DuplicateKeyError:
+            return jsonify({"success": True, "duplicate": True, "message": "Message already logged"}), 200
+    publish_event(msg_doc["email"], "message", msg_doc)
     return jsonify({"success": True, "message": "Message logged"}), 200
 
 # --------------------- Fetch Session Messages ---------------------
+def _wants_page(data):
+    # keyset pagination is opt-in so older clients still get the full list
+    return any(data.get(k) for k in ("limit", "before", "after"))
+
 @app.route('/api/session-messages', methods=['POST'])
 def get_session_messages():
     data       = request.get_json() or {}
@@ -134,33 +231,40 @@ def get_session_messages():
     if not email or not session_id:
         return jsonify({"error": "Missing email or session_id"}), 400
 
-    docs = db.messages.find({"email": email, "session_id": session_id}).sort("timestamp", 1)
-    messages = [{
-        "_id":        str(d["_id"]),
-        "sender":     d["sender"],
-        "message":    d["message"],
-        "session_id": d["session_id"],
-        "timestamp":  d["timestamp"].isoformat() if hasattr(d["timestamp"], "isoformat") else d["timestamp"]
-    } for d in docs]
-    return jsonify({"success": True, "messages": messages}), 200
+    query = {"email": email, "session_id": session_id}
+    fields = MESSAGE_FIELDS
+    page   = None
+    if _wants_page(data):
+        try:
+            messages, page = paginate(db.messages, query, parse_limit(data.get("limit")),
+                                      before=data.get("before"), after=data.get("after"),
+                                      projection=fields)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        messages = list(db.messages.find(query, fields).sort("timestamp", 1))
+
+    resp = {"success": True, "messages": messages}
+    if page:
+        resp["page"] = page
+    return jsonify(resp), 200
 
 # --------------------- User’s Sessions List ---------------------
 
 @app.route('/api/sessions/<email>', methods=['GET'])
 def get_user_sessions(email):
     # Read from the sessions collection (where you upsert in log-message)
-    docs = db.sessions.find({"email": email})
-    sessions = []
-    for doc in docs:
-        # doc["created_at"] is already a datetime
-        ts = doc.get("created_at", datetime.utcnow())
-        # Convert to ISO string
-        iso = ts.isoformat() if hasattr(ts, "isoformat") else ts
-        sessions.append({
-            "id":         doc["session_id"],
-            "created_at": iso
-        })
+    sessions = list(db.sessions.aggregate(sessions_pipeline(email)))
+    return jsonify({"success": True, "sessions": sessions}), 200
 
+@app.route('/api/sessions/<email>/summary', methods=['GET'])
+def get_session_summaries(email):
+    # newest first, with last message preview and count, for the chat sidebar
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    sessions = list(db.messages.aggregate(session_summary_pipeline(email, limit)))
     return jsonify({"success": True, "sessions": sessions}), 200
 
 
@@ -168,42 +272,259 @@ def get_user_sessions(email):
 # --------------------- Mood Logging (Fixed with Emotion) ---------------------
 @app.route('/api/mood-log', methods=['POST'])
 def log_mood():
-    data       = request.get_json() or {}
-    session_id = data.get("session_id") or data.get("sessionId")
-    user_email = data.get("email")      or data.get("userEmail")
-    mood       = data.get("mood")
-    timestamp  = data.get("timestamp")  or datetime.utcnow()
-
-    if not session_id or not user_email or mood is None:
-        return jsonify({"error": "Missing session_id, email, or mood"}), 400
-
-    # Auto determine emotion from mood score
-    def determine_emotion(mood_score):
-        if mood_score >= 8:
-            return "Happy"
-        elif mood_score >= 5:
-            return "Neutral"
-        elif mood_score >= 3:
-            return "Sad"
-        else:
-            return "Anxious"
-
-    emotion = determine_emotion(mood)
-
-    db.sessions.update_one(
-        {"session_id": session_id},
-        {"$setOnInsert": {"session_id": session_id, "email": user_email, "created_at": timestamp}},
-        upsert=True
-    )
-    db.mood_logs.insert_one({
-        "session_id":  session_id,
-        "email":       user_email,
-        "mood":        mood,
-        "emotion":     emotion,  # ✅ Added emotion here
-        "timestamp":   timestamp
-    })
+    mood_doc, error = build_mood_doc(keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+
+    if write_behind:
+        write_behind.append("mood", mood_doc)
+    else:
+        ensure_sessions([mood_doc])
+        try:
+            db.mood_logs.insert_one(mood_doc)
+        except DuplicateKeyError:
+            rollups.refresh_duplicates(db, [mood_doc])
+            return jsonify({"success": True, "duplicate": True, "message": "Mood already logged"}), 200
+        rollups.record_mood(db, mood_doc)
+    publish_event(mood_doc["email"], "mood", mood_doc)
     return jsonify({"success": True, "message": "Mood logged with emotion"}), 200
 
+# --------------------- Batch Ingest ---------------------
+INGEST_MAX_EVENTS = 500
+INGEST_BUILDERS = {"message": build_message_doc, "mood": build_mood_doc}
+
+@app.route('/api/ingest/batch', methods=['POST'])
+def ingest_batch():
+    # {"events": [{"type": "message"|"mood", ...same fields as the single routes}]}
+    data  = request.get_json() or {}
+    items = data.get("events")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "events must be a non-empty list"}), 400
+    if len(items) > INGEST_MAX_EVENTS:
+        return jsonify({"error": f"At most {INGEST_MAX_EVENTS} events per batch"}), 413
+
+    results = [None] * len(items)
+    valid   = []                     # (item index, kind, doc)
+    for i, item in enumerate(items):
+        kind  = item.get("type") if isinstance(item, dict) else None
+        build = INGEST_BUILDERS.get(kind)
+        if not build:
+            results[i] = {"ok": False, "error": "Unknown event type"}
+            continue
+        doc, error = build(item)
+        if error:
+            results[i] = {"ok": False, "error": error}
+            continue
+        valid.append((i, kind, doc))
+
+    written = write_logged([(kind, doc) for _, kind, doc in valid]) if valid else []
+    for (i, _, _), result in zip(valid, written):
+        results[i] = result
+
+    ok = sum(1 for r in results if r["ok"])
+    return jsonify({"success": ok == len(items), "written": ok, "results": results}), 200
+
+def write_logged(items):
+    """Write [(kind, doc)] with one unordered bulk_write per collection.
+
+    New sessions are upserted first so they exist, mood rollups and live events
+    follow for the documents that landed. Returns a result dict per item, in
+    order; a repeated event_key is reported as a duplicate, not an error.
+    """
+    results = [None] * len(items)
+    inserts = {"message": [], "mood": []}   # kind -> [(item index, doc)]
+    for i, (kind, doc) in enumerate(items):
+        inserts[kind].append((i, doc))
+
+    ensure_sessions([doc for _, doc in items])
+    for kind, coll in (("message", db.messages), ("mood", db.mood_logs)):
+        batch = inserts[kind]
+        if not batch:
+            continue
+        failed = {}
+        try:
+            coll.bulk_write([InsertOne(doc) for _, doc in batch], ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err for err in e.details["writeErrors"]}
+        written, duplicates = [], []
+        for pos, (i, doc) in enumerate(batch):
+            err = failed.get(pos)
+            if err is None:
+                results[i] = {"ok": True, "id": str(doc["_id"])}
+                written.append(doc)
+            elif err["code"] == DUPLICATE_KEY and "event_key" in doc:
+                results[i] = {"ok": True, "duplicate": True}
+                duplicates.append(doc)
+            else:
+                results[i] = {"ok": False, "error": err.get("errmsg", "Write failed")}
+        if kind == "mood" and written:
+            db.mood_daily.bulk_write([rollups.mood_update(d) for d in written], ordered=False)
+        if kind == "mood" and duplicates:
+            rollups.refresh_duplicates(db, duplicates)
+        for doc in written:
+            publish_event(doc["email"], kind, doc)
+    return results
+
+# --------------------- Chat Gateway ---------------------
+# One request per chat turn: forward to Rasa over pooled keep-alive
+# connections and log the whole turn server-side.
+rasa = RasaClient(
+    os.environ.get("AURACARE_RASA_URL", DEFAULT_RASA_URL),
+    pool_size=int(os.environ.get("AURACARE_RASA_POOL", "32")),
+    read_timeout=float(os.environ.get("AURACARE_RASA_TIMEOUT", "60")),
+)
+turn_writes = ThreadPoolExecutor(int(os.environ.get("AURACARE_CHAT_WRITERS", "8")),
+                                 thread_name_prefix="chat-log")
+
+def log_turn(items):
+    if write_behind:
+        for kind, doc in items:
+            write_behind.append(kind, doc)
+            publish_event(doc["email"], kind, doc)
+    else:
+        write_logged(items)
+
+def begin_turn(data):
+    """Validate a chat payload and start logging the user's side of the turn.
+
+    Returns (turn, error). The user's message and mood are written on
+    turn_writes while Rasa works, so they are kept even if Rasa fails.
+    """
+    session_id = data.get("session_id") or data.get("sessionId")
+    text       = data.get("message")
+    if not session_id or not text:
+        return None, "Missing session_id or message"
+    key, error = event_key(data, reserve=16)
+    if error:
+        return None, error
+
+    turn = {"data": data, "session_id": session_id, "text": text, "key": key}
+    # signed-out visitors still get answers, there's just nothing to log
+    now = datetime.utcnow()
+    user_msg, _ = build_message_doc(turn_fields(turn, "user", sender="user", timestamp=now))
+    items = [("message", user_msg)] if user_msg else []
+    mood_doc = None
+    if user_msg and data.get("mood") is not None:
+        mood_doc, _ = build_mood_doc(turn_fields(turn, "mood", timestamp=now))
+        if mood_doc:
+            items.append(("mood", mood_doc))
+    turn["logged"]      = bool(user_msg)
+    turn["mood_logged"] = bool(mood_doc)
+    turn["pending"] = turn_writes.submit(log_turn, items) if items else None
+    return turn, None
+
+def rasa_metadata(turn, **extra):
+    # one mood row per turn: the LLaMA action only logs its own reading when the
+    # browser sent none, under this turn's mood key so a retried turn can't add another
+    email = turn["data"].get("email") or turn["data"].get("userEmail")
+    meta = {"email": email} if email else {}
+    if turn["mood_logged"]:
+        meta["mood_logged"] = True
+    elif turn["key"]:
+        meta["event_key"] = f"{turn['key']}:mood"
+    return {**meta, **extra}
+
+def turn_fields(turn, suffix, **overrides):
+    # a retried turn reuses its key, so each logged part gets a derived one
+    fields = {**turn["data"], **overrides, "event_key": f"{turn['key']}:{suffix}" if turn["key"] else None}
+    fields.pop("idempotency_key", None)
+    return fields
+
+def end_turn(turn, reply_texts):
+    """Log the bot's replies and wait for the user's side to land."""
+    if turn["logged"]:
+        replied_at = datetime.utcnow()
+        bot_docs = [
+            ("message", build_message_doc(turn_fields(turn, f"bot:{n}", sender="bot", message=text,
+                                                      timestamp=replied_at))[0])
+            for n, text in enumerate(t for t in reply_texts if t)
+        ]
+        if bot_docs:
+            log_turn(bot_docs)
+    if turn["pending"]:
+        turn["pending"].result()
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    # {"email", "session_id", "message", "mood"?: 0-10 sentiment score, "event_key"?}
+    turn, error = begin_turn(keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        # Rasa keys its tracker by sender, so each chat session is its own conversation
+        replies = rasa.send(turn["session_id"], turn["text"], metadata=rasa_metadata(turn))
+    except RasaUnavailable:
+        replies = None
+    end_turn(turn, [reply_text(r) for r in replies or []])
+
+    if replies is None:
+        return jsonify({"success": False, "error": "Bot unreachable"}), 502
+    return jsonify({"success": True, "responses": replies}), 200
+
+# --------------------- Streaming Chat ---------------------
+# Same turn as /api/chat, answered as SSE. Rasa is told the client can stream,
+# so the LLaMA action hands back its prompt ({"custom": {"llm_stream": ...}})
+# instead of generating, and the tokens are relayed here as Ollama emits them:
+#   event: message  a complete Rasa message (text, buttons, custom)
+#   event: token    {"text": chunk} to append to reply <id>
+#   event: reply    {"text": final} once reply <id> is complete
+#   event: done     {"ttft_ms", "total_ms"} measured from the request
+llm = OllamaStreamer(
+    os.environ.get("AURACARE_OLLAMA_URL", DEFAULT_OLLAMA_URL),
+    pool_size=int(os.environ.get("AURACARE_LLM_POOL", "32")),
+    deadline=float(os.environ.get("AURACARE_LLM_DEADLINE", "120")),
+)
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    started = time.perf_counter()
+    turn, error = begin_turn(keyed_payload())
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        replies = rasa.send(turn["session_id"], turn["text"], metadata=rasa_metadata(turn, stream=True))
+    except RasaUnavailable:
+        end_turn(turn, [])
+        return jsonify({"success": False, "error": "Bot unreachable"}), 502
+
+    def generate():
+        texts, parts, ttft = [], None, None
+        try:
+            for n, reply in enumerate(replies):
+                job = (reply.get("custom") or {}).get("llm_stream")
+                if not job:
+                    texts.append(reply_text(reply))
+                    yield events.format_sse(n, "message", reply)
+                    continue
+                parts = []
+                try:
+                    for chunk in llm.stream(job["prompt"], model=job.get("model", "llama3"),
+                                            **job.get("params", {})):
+                        if ttft is None:
+                            ttft = time.perf_counter() - started
+                        parts.append(chunk)
+                        yield events.format_sse(n, "token", {"text": chunk})
+                    text = "".join(parts).strip()
+                except LLMUnavailable as e:
+                    print(f"❌ LLM stream failed: {e}")
+                    text = "".join(parts).strip() or job.get("fallback", "")
+                texts.append(text)
+                parts = None
+                yield events.format_sse(n, "reply", {"text": text})
+            yield events.format_sse(len(replies), "done", {
+                "ttft_ms":  round(ttft * 1000, 1) if ttft is not None else None,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+        finally:
+            # also runs when the browser goes away mid-stream: log what was generated,
+            # including the reply it was cut off in
+            if parts:
+                texts.append("".join(parts).strip())
+            end_turn(turn, texts)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # --------------------- Retrieve Mood Logs by Session ---------------------
 @app.route('/api/mood-logs/session/<session_id>', methods=['GET'])
 def get_mood_logs_by_session(session_id):
@@ -213,9 +534,63 @@ def get_mood_logs_by_session(session_id):
 # --------------------- Retrieve Mood Logs by Email ---------------------
 @app.route('/api/mood-logs/email/<email>', methods=['GET'])
 def get_mood_logs_by_email(email):
+    if wants_ndjson():
+        return ndjson_response(db.mood_logs.find({"email": email}, {"_id": 0}))
     logs = list(db.mood_logs.find({"email": email}, {"_id": 0}))
     return jsonify({"moods": logs}), 200
 
+# --------------------- Daily Mood Rollups ---------------------
+@app.route('/api/mood-daily/<email>', methods=['GET'])
+def get_mood_daily(email):
+    try:
+        days = max(1, min(int(request.args.get("days", rollups.DEFAULT_DAYS)), 366))
+    except ValueError:
+        return jsonify({"error": "Invalid days"}), 400
+    series, emotions = rollups.daily_series(db, email, days)
+    return jsonify({"success": True, "days": series, "emotions": emotions}), 200
+
+# --------------------- Mood Log Delta Feed ---------------------
+MOOD_DELTA_BATCH = 500
+
+@app.route('/api/mood-logs/email/<email>/delta', methods=['GET'])
+def get_mood_logs_delta(email):
+    # Only rows newer than the `since` high-water mark (an ObjectId); no `since`
+    # is the initial load. Nothing new → empty 204.
+    # Rows can commit out of _id order (other workers, write-behind), so rows in
+    # the overlap window just behind `since` come back too; clients dedupe by _id.
+    since = request.args.get("since")
+    query = {"email": email}
+    late = []
+    if since:
+        try:
+            since = ObjectId(since)
+        except Exception:
+            return jsonify({"error": "Invalid since cursor"}), 400
+        query["_id"] = {"$gt": since}
+        late = list(db.mood_logs.find({"email": email, "_id": {"$gt": events.overlap_floor(since), "$lte": since}})
+                    .sort("_id", 1).limit(MOOD_DELTA_BATCH))
+
+    docs = list(db.mood_logs.find(query).sort("_id", 1).limit(MOOD_DELTA_BATCH + 1))
+    if not docs and not late:
+        return "", 204
+
+    has_more = len(docs) > MOOD_DELTA_BATCH
+    docs = docs[:MOOD_DELTA_BATCH]
+    cursor = str(docs[-1]["_id"] if docs else since)
+    # _id stays in: it's the SSE event id too, so clients can drop rows they got both ways
+    return jsonify({"moods": late + docs, "cursor": cursor, "has_more": has_more}), 200
+
+# --------------------- Live Updates (SSE) ---------------------
+@app.route('/api/stream/<email>', methods=['GET'])
+def stream_updates(email):
+    # EventSource sends Last-Event-ID on reconnect; ?last_event_id= for manual resume
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    return Response(
+        events.stream(event_bus, db, email, last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # --------------------- Activity Logging ---------------------
 @app.route('/api/activity-log', methods=['POST'])
 def log_activity():
@@ -263,23 +638,36 @@ def message_history():
         return jsonify({"success": False, "message": "Invalid date format"}), 400
 
     end = start + timedelta(days=1)
-    docs = db.messages.find({
+    query = {
         "email":     email,
         "timestamp": {"$gte": start, "$lt": end}
-    }).sort("timestamp", 1)
-
-    history = [{
-        "id":        str(d["_id"]),
-        "sender":    d["sender"],
-        "message":   d["message"],
-        "timestamp": d["timestamp"].isoformat()
-    } for d in docs]
-    return jsonify({"success": True, "messages": history}), 200
+    }
+    # _id stays in the projection: the keyset cursors are built from it
+    fields = {"id": "$_id", "sender": 1, "message": 1, "timestamp": 1}
+    page = None
+    if _wants_page(data):
+        try:
+            history, page = paginate(db.messages, query, parse_limit(data.get("limit")),
+                                     before=data.get("before"), after=data.get("after"),
+                                     projection=fields)
+        except InvalidCursor as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+    else:
+        history = list(db.messages.aggregate([
+            {"$match": query}, {"$sort": {"timestamp": 1}}, {"$project": fields}
+        ]))
+
+    resp = {"success": True, "messages": history}
+    if page:
+        resp["page"] = page
+    return jsonify(resp), 200
 
 
 # --------------------- User’s Full Sessions (With Created Time) ---------------------
 @app.route('/api/user-sessions/<email>', methods=['GET'])
 def get_sessions_with_created_at(email):
+    if wants_ndjson():
+        return ndjson_response(db.sessions.find({"email": email}, {"_id": 0}))
     sessions = list(db.sessions.find({"email": email}, {"_id": 0}))  # fetch from sessions collection
     return jsonify({"success": True, "sessions": sessions}), 200
 
@@ -287,12 +675,12 @@ def get_sessions_with_created_at(email):
 # --------------------- Get All Users (Admin) ---------------------
 @app.route('/api/users', methods=['GET'])
 def get_all_users():
-    users = list(users_collection.find({}, {"password": 0}))  # exclude password
-    for user in users:
-        user["_id"] = str(user["_id"])
-        user["role"] = user.get("role", "User")      # default role: User
-        user["status"] = user.get("status", "Active") # default status: Active
-        user["lastLogin"] = user.get("lastLogin")     # optional: handle last login if you store it
+    users = profile_cache.get(ALL_USERS_KEY)
+    if wants_ndjson():
+        return ndjson_response(users if users is not None else db.users.aggregate(USERS_PIPELINE))
+    if users is None:
+        users = list(db.users.aggregate(USERS_PIPELINE))
+        profile_cache.set(ALL_USERS_KEY, users)
     return jsonify({"success": True, "users": users}), 200
 
 
@@ -302,32 +690,20 @@ def get_all_users():
 # GET all quizzes
 @app.route('/api/quiz', methods=['GET'])
 def list_quizzes():
-    docs = db.quiz.find({})
-    quizzes = []
-    for d in docs:
-        quizzes.append({
-            "id":         str(d["_id"]),
-            "question":   d.get("question"),
-            "options":    d.get("options", []),
-            "answer":     d.get("answer"),
-            "category":   d.get("category"),
-            "difficulty": d.get("difficulty")
-        })
-    return jsonify({"success": True, "questions": quizzes}), 200
+    return catalogs.respond("quiz", build_quiz_catalog)
+
+def build_quiz_catalog():
+    quizzes = list(db.quiz.aggregate(QUIZ_PIPELINE))
+    return app.json.dumps({"success": True, "questions": quizzes}).encode()
 
 # POST a new quiz
 @app.route('/api/quiz', methods=['POST'])
 def create_quiz():
     data = request.get_json() or {}
     # you could add validation here
-    res = db.quiz.insert_one({
-        "question":   data.get("question"),
-        "options":    data.get("options", []),
-        "answer":     data.get("answer"),
-        "category":   data.get("category"),
-        "difficulty": data.get("difficulty")
-    })
+    res = db.quiz.insert_one(quiz_fields(data, for_insert=True))
     if res.inserted_id:
+        catalogs.bump("quiz")
         return jsonify({"success": True, "id": str(res.inserted_id)}), 201
     return jsonify({"success": False}), 500
 
@@ -337,15 +713,10 @@ def update_quiz(quiz_id):
     data = request.get_json() or {}
     result = db.quiz.update_one(
         {"_id": ObjectId(quiz_id)},
-        {"$set": {
-            "question":   data.get("question"),
-            "options":    data.get("options"),
-            "answer":     data.get("answer"),
-            "category":   data.get("category"),
-            "difficulty": data.get("difficulty")
-        }}
+        {"$set": quiz_fields(data)}
     )
     if result.modified_count:
+        catalogs.bump("quiz")
         return jsonify({"success": True}), 200
     return jsonify({"success": False}), 200
 
@@ -354,6 +725,7 @@ def update_quiz(quiz_id):
 def delete_quiz(quiz_id):
     result = db.quiz.delete_one({"_id": ObjectId(quiz_id)})
     if result.deleted_count:
+        catalogs.bump("quiz")
         return jsonify({"success": True}), 200
     return jsonify({"success": False}), 404
 
@@ -361,13 +733,13 @@ def delete_quiz(quiz_id):
 # ————— List all tracks —————
 @app.route('/api/music', methods=['GET'])
 def list_music():
-    docs = list(db.music.find())
-    # convert ObjectId → string and rename to `id`
-    music = []
-    for d in docs:
-        d['id'] = str(d.pop('_id'))
-        music.append(d)
-    return jsonify({ 'success': True, 'music': music }), 200
+    if wants_ndjson():
+        return ndjson_response(db.music.aggregate(MUSIC_PIPELINE))
+    return catalogs.respond('music', build_music_catalog)
+
+def build_music_catalog():
+    music = list(db.music.aggregate(MUSIC_PIPELINE))
+    return app.json.dumps({ 'success': True, 'music': music }).encode()
 
 # ————— Create a track —————
 @app.route('/api/music', methods=['POST'])
@@ -381,8 +753,9 @@ def create_music():
       'url':         data['url'],
       'category':    data['category']
     })
+    catalogs.bump('music')
     new = db.music.find_one({'_id': res.inserted_id})
-    new['id'] = str(new.pop('_id'))
+    new['id'] = new.pop('_id')
     return jsonify({ 'success': True, 'music': new }), 201
 
 # ————— Update a track —————
@@ -405,6 +778,7 @@ def update_music(music_id):
       }}
     )
     if res.modified_count:
+        catalogs.bump('music')
         return jsonify({ 'success': True }), 200
     return jsonify({ 'success': False, 'error': 'Nothing changed' }), 200
 
@@ -418,8 +792,75 @@ def delete_music(music_id):
 
     res = db.music.delete_one({'_id': oid})
     if res.deleted_count:
+        catalogs.bump('music')
         return jsonify({ 'success': True }), 200
     return jsonify({ 'success': False, 'error': 'Not found' }), 404
 
+# --------------------- Write-Behind Logging (optional) ---------------------
+def insert_ignoring_duplicates(coll, docs):
+    # returns the docs actually inserted; duplicate _ids (journal replays) are skipped
+    try:
+        coll.insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        if any(err["code"] != DUPLICATE_KEY for err in errors):
+            raise
+        dupes = {err["index"] for err in errors}
+        return [d for i, d in enumerate(docs) if i not in dupes]
+
+def flush_logged(items):
+    by_kind = {"message": [], "mood": []}
+    for kind, doc in items:
+        by_kind[kind].append(doc)
+    ensure_sessions([doc for _, doc in items])
+    if by_kind["message"]:
+        insert_ignoring_duplicates(db.messages, by_kind["message"])
+    if by_kind["mood"]:
+        inserted = insert_ignoring_duplicates(db.mood_logs, by_kind["mood"])
+        if len(inserted) == len(by_kind["mood"]):
+            db.mood_daily.bulk_write([rollups.mood_update(d) for d in inserted], ordered=False)
+        else:
+            # a retry or journal replay: some of these were inserted before, maybe without
+            # their rollup, so recount their days from mood_logs instead of $inc-ing
+            rollups.refresh_days(db, {(d["email"], rollups.day_key(d["timestamp"])) for d in by_kind["mood"]})
+
+write_behind = None
+if os.environ.get("AURACARE_WRITE_BEHIND") == "1":
+    write_behind = WriteBehindBuffer(
+        claim_journal_dir(os.environ.get("AURACARE_JOURNAL_DIR", "journal")),
+        flush_logged,
+        flush_interval=float(os.environ.get("AURACARE_FLUSH_INTERVAL", "0.5")),
+        batch_size=int(os.environ.get("AURACARE_FLUSH_BATCH", "500")),
+        max_attempts=int(os.environ.get("AURACARE_FLUSH_MAX_ATTEMPTS", "5")),
+    ).start()
+
+# --------------------- Metrics ---------------------
+ACTIONS_METRICS_URL = os.environ.get("AURACARE_ACTIONS_METRICS_URL", "http://localhost:5056/metrics")
+
+def actions_metrics():
+    # the LLM cache and scheduler live in the Rasa action server (see actions/llm_metrics.py)
+    try:
+        resp = requests.get(ACTIONS_METRICS_URL, timeout=1)
+        resp.raise_for_status()
+        return resp.json()
+    except (requests.RequestException, ValueError):
+        return None
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "write_behind":      write_behind.stats() if write_behind else None,
+        "password_hashing":  hasher.stats(),
+        "profile_cache":     profile_cache.stats(),
+        "known_sessions":    known_sessions.stats(),
+        "catalogs":          catalogs.stats(),
+        "compression":       compressor.stats(),
+        "stream_subscribers": event_bus.subscriber_count(),
+        "rasa":              rasa.stats(),
+        "llm_stream":        llm.stats(),
+        "llm_actions":       actions_metrics(),
+    }), 200
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,249 @@
+"""Write-behind buffering for the chat/mood logging routes.
+
+Instead of blocking the request on MongoDB, log_message/log_mood append the
+document to a local append-only journal and return. A background thread
+fsyncs the journal in small groups and drains the buffer into MongoDB in
+batches. Journal segments are only deleted once everything in them has been
+written, and any segments left on disk are replayed at startup.
+
+Documents get their _id before they are journaled, so a replay after a crash
+mid-flush is absorbed as duplicate-key errors instead of double inserts.
+
+A batch that keeps failing for anything but a lost connection is retried one
+document at a time after `max_attempts` tries; documents that still fail are
+moved to `dead-letter.log` in the journal directory, so one bad document
+can't hold up every write behind it.
+"""
+import fcntl
+import glob
+import os
+import threading
+import time
+
+from bson import ObjectId, json_util
+from pymongo.errors import ConnectionFailure
+
+DEFAULT_FLUSH_INTERVAL = 0.5   # seconds between drains into MongoDB
+DEFAULT_BATCH_SIZE = 500       # max documents per flush_fn call
+DEFAULT_FSYNC_INTERVAL = 0.05  # seconds between journal fsyncs
+DEFAULT_MAX_ATTEMPTS = 5       # failed flushes of one batch before it's split up
+DEAD_LETTER_FILE = "dead-letter.log"
+
+
+_held_locks = []   # fds kept open so slot locks last as long as the process
+
+
+def claim_journal_dir(base_dir, max_slots=256):
+    """Lock and return a journal directory no other live process is using.
+
+    Pre-forked workers can't share one journal, so each takes the first free
+    slot: `base_dir` itself, then `base_dir/worker-1`, `worker-2`, ... The
+    flock is held for the life of the process and dropped by the kernel when
+    it exits, so a replacement worker reclaims (and replays) the slot its
+    predecessor left behind.
+    """
+    for slot in range(max_slots):
+        path = base_dir if slot == 0 else os.path.join(base_dir, f"worker-{slot}")
+        os.makedirs(path, exist_ok=True)
+        fd = os.open(os.path.join(path, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        _held_locks.append(fd)
+        return path
+    raise RuntimeError(f"No free journal slot under {base_dir}")
+
+
+class WriteBehindBuffer:
+    """Journal-backed buffer of (kind, doc) items drained by `flush_fn`.
+
+    `flush_fn(items)` receives a list of (kind, doc) and must raise if the
+    batch wasn't written; failed batches stay buffered and are retried. It
+    may be called again with documents it already wrote, so it must ignore
+    duplicates.
+    """
+
+    def __init__(self, journal_dir, flush_fn, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE, fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.journal_dir = journal_dir
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._buffer = []     # items appended to the open segment
+        self._pending = []    # items from sealed segments, not yet written
+        self._sealed = []     # sealed segment paths awaiting a full flush
+        self._seq = 0
+        self._dirty = False
+        self._thread = None
+        self._attempts = 0    # consecutive failures of the batch at the head of _pending
+
+        self.flushed = 0
+        self.flush_errors = 0
+        self.quarantined = 0
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._replay()
+        self._open_segment()
+
+    # --------------------- journal ---------------------
+    def _segment_path(self, seq):
+        return os.path.join(self.journal_dir, f"journal-{seq:012d}.log")
+
+    def _replay(self):
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "journal-*.log"))):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json_util.loads(line)
+                    except ValueError:
+                        break  # torn write at the tail of a crashed segment
+                    self._pending.append((rec["kind"], rec["doc"]))
+            self._sealed.append(path)
+            self._seq = max(self._seq, int(os.path.basename(path)[8:20]) + 1)
+
+    def _open_segment(self):
+        self._path = self._segment_path(self._seq)
+        self._seq += 1
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def _seal_segment(self):
+        # caller holds the lock
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._sealed.append(self._path)
+        self._pending.extend(self._buffer)
+        self._buffer = []
+        self._dirty = False
+        self._open_segment()
+
+    # --------------------- public API ---------------------
+    def append(self, kind, doc):
+        """Journal one document and queue it for MongoDB. Returns the doc."""
+        doc.setdefault("_id", ObjectId())
+        line = json_util.dumps({"kind": kind, "doc": doc})
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._buffer.append((kind, doc))
+            self._dirty = True
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+        return doc
+
+    def depth(self):
+        """Documents accepted but not yet written to MongoDB."""
+        with self._lock:
+            return len(self._buffer) + len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            sealed = len(self._sealed)
+        return {
+            "buffer_depth":    self.depth(),
+            "sealed_segments": sealed,
+            "flushed":         self.flushed,
+            "flush_errors":    self.flush_errors,
+            "quarantined":     self.quarantined,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=10):
+        """Stop the flusher after a final drain."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            self._file.close()
+            if not self._buffer and os.path.getsize(self._path) == 0:
+                os.remove(self._path)
+
+    # --------------------- flusher ---------------------
+    def _fsync(self):
+        with self._lock:
+            if self._dirty:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def _flush(self):
+        with self._lock:
+            if self._buffer:
+                self._seal_segment()
+            pending = list(self._pending)
+
+        done = 0
+        try:
+            while done < len(pending):
+                chunk = pending[done:done + self.batch_size]
+                try:
+                    self.flush_fn(chunk)
+                except ConnectionFailure:
+                    raise   # MongoDB is away, not the documents' fault: keep retrying
+                except Exception:
+                    self._attempts += 1
+                    if self._attempts < self.max_attempts:
+                        raise
+                    self._flush_one_by_one(chunk)
+                self._attempts = 0
+                done += len(chunk)
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"❌ write-behind flush failed, will retry: {e}")
+        finally:
+            self.flushed += done
+            with self._lock:
+                del self._pending[:done]
+                if not self._pending:
+                    for path in self._sealed:
+                        os.remove(path)
+                    self._sealed = []
+
+    def _flush_one_by_one(self, chunk):
+        # documents already written are absorbed as duplicates by flush_fn
+        for item in chunk:
+            try:
+                self.flush_fn([item])
+            except ConnectionFailure:
+                raise
+            except Exception as e:
+                self._quarantine(item, e)
+
+    def _quarantine(self, item, error):
+        kind, doc = item
+        line = json_util.dumps({"kind": kind, "doc": doc, "error": repr(error)})
+        with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.quarantined += 1
+        print(f"❌ write-behind: moved {kind} {doc.get('_id')} to {DEAD_LETTER_FILE}: {error}")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            woke = self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            self._fsync()
+            if woke or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+        self._fsync()
+        self._flush()
@@ -11,6 +11,12 @@ import DashboardFooter from "@/components/DashboardFooter";
 import { useDarkMode } from "@/components/DarkModeProvider";
 
 const POLL_INTERVAL = 10_000;
+// Safety net under the stream: pushes can miss writes (another worker without a
+// change stream, a dropped connection), so refetch now and then regardless.
+const SAFETY_POLL_INTERVAL = 60_000;
+// Rollups lag a pushed mood by up to one write-behind flush (0.5 s by default),
+// and a burst of moods only needs one refetch.
+const REFRESH_DELAY = 1_000;
 
 const COLORS = ["#4CAF50", "#2196F3", "#FFC107", "#F44336"];
 
@@ -28,44 +34,59 @@ const Analytics: React.FC = () => {
       return;
     }
 
-    const fetchMood = async () => {
-      const res = await fetch(`http://localhost:5000/api/mood-logs/email/${encodeURIComponent(userEmail)}`);
-      const { moods } = await res.json();
-      
-      if (Array.isArray(moods)) {
-        // For Line Chart: Only Day, Mood, Emotion
-        setMoodData(moods.map(e => ({
-          day: new Date(e.timestamp).toLocaleString('en-US', {
-            weekday: 'short',
-            hour: '2-digit',
-            minute: '2-digit',
-            hour12: true,
-          }),
-          
-          mood: e.mood,
-          emotion: e.emotion || 'Neutral',
-        })));
-    
-        // For Pie Chart: Count all emotions dynamically
-        const moodCounts: Record<string, number> = {};
-    
-        moods.forEach(e => {
-          const emotion = (e.emotion || 'Neutral').trim();
-          moodCounts[emotion] = (moodCounts[emotion] || 0) + 1;
-        });
-    
-        const pieDataFormatted = Object.entries(moodCounts)
-          .map(([name, value]) => ({ name, value }));
-    
-        setPieData(pieDataFormatted);
-      }
+    // Pre-aggregated per-day rollups: O(days) rows however many moods were logged.
+    const fetchDaily = async () => {
+      const res = await fetch(`http://localhost:5000/api/mood-daily/${encodeURIComponent(userEmail)}`);
+      if (!res.ok) return;
+      const body = await res.json();
+
+      // For Line Chart: average mood per day
+      setMoodData((body.days || []).map((d: any) => ({
+        day: new Date(`${d.day}T00:00:00Z`).toLocaleDateString('en-US', {
+          weekday: 'short',
+          month: 'short',
+          day: 'numeric',
+          timeZone: 'UTC',  // rollup days are UTC days
+        }),
+        mood: d.avg,
+        count: d.count,
+        min: d.min,
+        max: d.max,
+      })));
+
+      // For Pie Chart: emotion totals, already summed by the server
+      setPieData(body.emotions || []);
     };
-    
-    
 
-    Promise.all([fetchMood()]).finally(() => setLoading(false));
-    const timer = setInterval(() => { fetchMood(); }, POLL_INTERVAL);
-    return () => clearInterval(timer);
+    let es: EventSource | null = null;
+    let timer: ReturnType<typeof setInterval> | null = null;
+    let refresh: ReturnType<typeof setTimeout> | null = null;
+
+    // Server pushes new mood rows; refetch the rollups shortly after one arrives,
+    // plus a slow poll in case a push never comes. Fall back to polling without EventSource.
+    if (typeof EventSource === 'undefined') {
+      fetchDaily().finally(() => setLoading(false));
+      timer = setInterval(() => { fetchDaily(); }, POLL_INTERVAL);
+    } else {
+      es = new EventSource(`http://localhost:5000/api/stream/${encodeURIComponent(userEmail)}`);
+      // (re)connected and subscribed: load now, so nothing written before the
+      // subscription is missed
+      es.onopen = () => { fetchDaily().finally(() => setLoading(false)); };
+      es.onerror = () => setLoading(false);
+      es.addEventListener('mood', () => {
+        if (refresh) clearTimeout(refresh);
+        refresh = setTimeout(() => { fetchDaily(); }, REFRESH_DELAY);
+      });
+      // too far behind for the server to replay: just reload
+      es.addEventListener('reset', () => { fetchDaily(); });
+      timer = setInterval(() => { fetchDaily(); }, SAFETY_POLL_INTERVAL);
+    }
+
+    return () => {
+      es?.close();
+      if (timer) clearInterval(timer);
+      if (refresh) clearTimeout(refresh);
+    };
   }, []);
 
   if (loading) {
@@ -82,8 +103,8 @@ const Analytics: React.FC = () => {
     return (
       <div className="bg-background p-4 border rounded-md shadow-md">
         <p className="font-medium">{`Day: ${label}`}</p>
-        <p className="text-primary">{`Mood: ${payload[0].value}/10`}</p>
-        <p className="text-muted-foreground">{`Emotion: ${d.emotion}`}</p>
+        <p className="text-primary">{`Average mood: ${payload[0].value}/10`}</p>
+        <p className="text-muted-foreground">{`${d.count} check-ins, low ${d.min}, high ${d.max}`}</p>
       </div>
     );
   };
@@ -116,7 +137,7 @@ const Analytics: React.FC = () => {
                     <YAxis domain={[0, 10]} label={{ value: "Mood", angle: -90, position: "insideLeft" }} />
                     <Tooltip content={<CustomTooltip />} />
                     <Legend />
-                    <Line type="monotone" dataKey="mood" stroke="#9C27B0" strokeWidth={2} activeDot={{ r: 8 }} name="Mood" />
+                    <Line type="monotone" dataKey="mood" stroke="#9C27B0" strokeWidth={2} activeDot={{ r: 8 }} name="Average mood" />
                   </LineChart>
                 </ResponsiveContainer>
               </div>
@@ -13,6 +13,7 @@ import { useNavigate } from "react-router-dom";
 import Sentiment from "sentiment";
 
 const sentiment = new Sentiment();
+const PAGE_SIZE = 50;
 
 interface Message {
   id: string;
@@ -26,12 +27,40 @@ interface Message {
 interface SessionItem {
   id: string;
   created_at: string;
+  last_activity?: string;
+  last_message?: string;
+  message_count?: number;
+}
+
+// Read a text/event-stream response body (EventSource can only GET).
+async function readEventStream(resp: Response, onEvent: (event: string, id: string, data: any) => void) {
+  const reader = resp.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const frame = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message", id = "", data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("id: ")) id = line.slice(4);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (data) onEvent(event, id, JSON.parse(data));
+    }
+  }
 }
 
 const Chat: React.FC = () => {
   const navigate = useNavigate();
   const { isDarkMode, toggleDarkMode } = useDarkMode();
   const chatContainerRef = useRef<HTMLDivElement>(null);
+  const skipAutoScroll = useRef(false);
 
   // --- Session setup ---
   const [sessionId, setSessionId] = useState(() => {
@@ -49,62 +78,21 @@ const Chat: React.FC = () => {
   });
 
   const [sessions, setSessions] = useState<SessionItem[]>([]);
+  // keyset cursor for the page older than what is on screen (null = nothing older)
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [message, setMessage] = useState("");
   const [isTyping, setIsTyping] = useState(false);
 
   const getUserEmail = () => localStorage.getItem("userEmail") || "";
 
-  // --- Logging helpers ---
-  const logMessage = async (sender: "user" | "bot", text: string, ts = new Date().toISOString()) => {
-    const email = getUserEmail();
-    if (!email) return;
-    const createdAt = sessionStorage.getItem("createdAt")!;
-    await fetch("http://localhost:5000/api/log-message", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        email,
-        sender,
-        message: text,
-        timestamp: createdAt,
-        session_id: sessionId,
-      }),
-    });
-  };
-
-  const logMood = async (mood: number, emotion?: string, energyLevel?: number, sleepHours?: number) => {
-    const email = getUserEmail();
-    if (!email) return;
-    await fetch("http://localhost:5000/api/mood-log", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        session_id: sessionId,
-        email,
-        mood,
-        emotion,
-        energyLevel,
-        sleepHours,
-        source: "chat",
-        timestamp: new Date().toISOString(),
-      }),
-    });
-  };
-
-  const getEmotionFromScore = (score: number) => {
-    if (score >= 8) return "Happy";
-    if (score >= 5) return "Neutral";
-    if (score >= 3) return "Sad";
-    return "Anxious";
-  };
-
   // --- Load & switch sessions ---
   useEffect(() => {
     const loadSessions = async () => {
       const email = getUserEmail();
       if (!email) return;
       const res  = await fetch(
-        `http://localhost:5000/api/sessions/${encodeURIComponent(email)}`
+        `http://localhost:5000/api/sessions/${encodeURIComponent(email)}/summary?limit=50`
       );
       const data = await res.json();
       if (!data.success) return;
@@ -119,7 +107,7 @@ const Chat: React.FC = () => {
           created_at: fallbackTs
         }));
       } else {
-        // New backend: already [{ id, created_at }]
+        // Summary endpoint: [{ id, created_at, last_activity, last_message, message_count }], newest first
         list = data.sessions as SessionItem[];
       }
 
@@ -129,11 +117,11 @@ const Chat: React.FC = () => {
     loadSessions();
   }, []);
   
-  const handleSessionClick = async (sid: string) => {
+  const fetchMessagePage = async (sid: string, before?: string) => {
     const res = await fetch("http://localhost:5000/api/session-messages", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ email: getUserEmail(), session_id: sid }),
+      body: JSON.stringify({ email: getUserEmail(), session_id: sid, limit: PAGE_SIZE, before }),
     });
     const body = await res.json();
     const msgs: Message[] = body.messages.map((m: any) => ({
@@ -144,12 +132,39 @@ const Chat: React.FC = () => {
       buttons: m.buttons,
       custom: m.custom,
     }));
+    const older = body.page?.has_more ? body.page.before : null;
+    return { msgs, older };
+  };
+
+  const handleSessionClick = async (sid: string) => {
+    // latest page first; older pages are pulled in as the user scrolls up
+    const { msgs, older } = await fetchMessagePage(sid);
     setSessionId(sid);
     setChatHistory(msgs);
+    setOlderCursor(older);
     sessionStorage.setItem("sessionId", sid);
     sessionStorage.setItem("chatHistory", JSON.stringify(msgs));
   };
 
+  const handleChatScroll = async () => {
+    const el = chatContainerRef.current;
+    if (!el || el.scrollTop > 0 || !olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const prevHeight = el.scrollHeight;
+      const { msgs, older } = await fetchMessagePage(sessionId, olderCursor);
+      skipAutoScroll.current = true;
+      setChatHistory(h => [...msgs, ...h]);
+      setOlderCursor(older);
+      // keep the viewport anchored on the message the user was reading
+      requestAnimationFrame(() => {
+        el.scrollTop = el.scrollHeight - prevHeight;
+      });
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
  // inside your Chat component
 
 // --- Delete session from sidebar, safely switch/regen sessions ---
@@ -191,6 +206,7 @@ const handleDeleteSession = (sid: string) => {
     const now = new Date().toISOString();
     setSessionId(sid);
     setChatHistory([]);
+    setOlderCursor(null);
     sessionStorage.setItem("sessionId", sid);
     sessionStorage.setItem("createdAt", now);
     sessionStorage.removeItem("chatHistory");
@@ -204,39 +220,54 @@ const handleDeleteSession = (sid: string) => {
     // 1) Append user message
     const userMsg: Message = { id: nowIso, content: message, sender: "user", timestamp: nowIso };
     setChatHistory(h => [...h, userMsg]);
-    await logMessage("user", message, nowIso);
 
-    // 2) Mood logging
+    // 2) Score the message; the server logs it with the turn
     const result = sentiment.analyze(message);
     const moodScore = Math.min(Math.max(Math.round((result.comparative + 1) * 5), 0), 10);
-    await logMood(moodScore, getEmotionFromScore(moodScore));
 
     // 3) Clear input & show typing
     setMessage("");
     setIsTyping(true);
 
-    // 4) Call Rasa
+    // 4) One round trip: the gateway calls Rasa, logs message, mood and replies,
+    //    and streams LLM replies token by token
     try {
-      const resp = await fetch("http://localhost:5005/webhooks/rest/webhook", {
+      const resp = await fetch("http://localhost:5000/api/chat/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ sender: "user", message }),
+        // event_key lets the server absorb a retried turn instead of logging it twice
+        body: JSON.stringify({
+          email: getUserEmail(), session_id: sessionId, message, mood: moodScore, event_key: crypto.randomUUID(),
+        }),
+      });
+      if (!resp.ok) throw new Error((await resp.json()).error);
+
+      // 5) One bubble per reply id; tokens grow it as they arrive
+      const bubbleIds: Record<string, string> = {};
+      const updateBubble = (replyId: string, update: (m: Message) => Message) => {
+        let bubbleId = bubbleIds[replyId];
+        if (!bubbleId) {
+          bubbleId = bubbleIds[replyId] = Date.now().toString() + Math.random();
+          const fresh: Message = { id: bubbleId, content: "", sender: "bot", timestamp: new Date().toISOString() };
+          setChatHistory(h => [...h, update(fresh)]);
+          setIsTyping(false);
+        } else {
+          setChatHistory(h => h.map(m => (m.id === bubbleId ? update(m) : m)));
+        }
+      };
+      await readEventStream(resp, (event, id, data) => {
+        if (event === "message") {
+          updateBubble(id, m => ({
+            ...m, content: data.text || data.custom?.reply || "", buttons: data.buttons, custom: data.custom,
+          }));
+        } else if (event === "token") {
+          updateBubble(id, m => ({ ...m, content: m.content + data.text }));
+        } else if (event === "reply") {
+          updateBubble(id, m => ({ ...m, content: data.text }));
+        } else if (event === "done") {
+          console.debug(`first token after ${data.ttft_ms} ms, turn took ${data.total_ms} ms`);
+        }
       });
-      const data = await resp.json();
-
-      // 5) Handle each bot message
-      for (const m of data) {
-        const botMsg: Message = {
-          id: Date.now().toString() + Math.random(),
-          content: m.text || m.custom?.reply || "",
-          sender: "bot",
-          timestamp: new Date().toISOString(),
-          buttons: m.buttons,
-          custom: m.custom,
-        };
-        setChatHistory(h => [...h, botMsg]);
-        await logMessage("bot", botMsg.content, botMsg.timestamp);
-      }
     } catch {
       setChatHistory(h => [
         ...h,
@@ -249,7 +280,11 @@ const handleDeleteSession = (sid: string) => {
 
   // --- Auto-scroll + persist ---
   useEffect(() => {
-    chatContainerRef.current?.scrollTo({ top: chatContainerRef.current.scrollHeight, behavior: "smooth" });
+    if (skipAutoScroll.current) {
+      skipAutoScroll.current = false;
+    } else {
+      chatContainerRef.current?.scrollTo({ top: chatContainerRef.current.scrollHeight, behavior: "smooth" });
+    }
     sessionStorage.setItem("chatHistory", JSON.stringify(chatHistory));
   }, [chatHistory]);
 
@@ -263,7 +298,7 @@ const handleDeleteSession = (sid: string) => {
         </Button>
         <div className="overflow-y-auto h-[calc(100vh-160px)] space-y-2">
         {sessions.map(s => {
-  const dt = new Date(s.created_at);
+  const dt = new Date(s.last_activity || s.created_at);
   const label =
     dt.toLocaleDateString(undefined, { weekday: "short", month: "short", day: "numeric" }) +
     " — " +
@@ -275,9 +310,15 @@ const handleDeleteSession = (sid: string) => {
     >
       <button
         onClick={() => handleSessionClick(s.id)}
-        className="flex-1 text-left p-2"
+        className="flex-1 text-left p-2 min-w-0"
       >
-        {label}
+        <div>{label}</div>
+        {s.last_message && (
+          <div className="text-xs text-gray-500 truncate">
+            {s.last_message}
+            {s.message_count ? ` · ${s.message_count}` : ""}
+          </div>
+        )}
       </button>
       <button
         onClick={() => handleDeleteSession(s.id)}
@@ -299,7 +340,10 @@ const handleDeleteSession = (sid: string) => {
           <Card className="w-full max-w-3xl h-full flex flex-col shadow-lg">
             <CardHeader><CardTitle className="text-center">AuraCare Chatbot</CardTitle></CardHeader>
             <CardContent className="flex-1 flex flex-col">
-              <div ref={chatContainerRef} className="flex-1 overflow-y-auto p-2 space-y-2">
+              <div ref={chatContainerRef} onScroll={handleChatScroll} className="flex-1 overflow-y-auto p-2 space-y-2">
+                {loadingOlder && (
+                  <div className="text-center text-xs text-gray-500">Loading earlier messages…</div>
+                )}
                 {chatHistory.map(m => (
                   <div key={m.id} className={`flex ${m.sender === "user" ? "justify-end" : "justify-start"}`}>
                     {m.sender === "bot" && (